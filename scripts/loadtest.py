@@ -0,0 +1,286 @@
+"""
+Load-testing harness for the /pca service.
+
+Levanta la app con uvicorn (1 o más workers), reproduce una mezcla configurable
+de fit / recommend / fit_and_recommend con N clientes concurrentes y reporta
+throughput y latencias p50/p95/p99 con histograma. El reporte se guarda en JSON
+para comparar corridas.
+
+Las peticiones recommend llevan --batch-size zonas; fit y fit_and_recommend
+llevan --fit-rows (un fit con muy pocas zonas no es representativo).
+
+Uso (desde la raíz del repo):
+    python scripts/loadtest.py --workers 1 4 --concurrency 16 --duration 20 \\
+        --batch-size 1 --mix recommend=8,fit=1,fit_and_recommend=1 --out loadtest.json
+
+    # contra un servidor ya levantado
+    python scripts/loadtest.py --url http://localhost:8000 --duration 10
+
+Nota: cada worker de uvicorn tiene su propio modelo en memoria. Antes de medir,
+el warmup repite `fit` (cada uno en una conexión nueva, para que el kernel lo
+reparta entre workers) hasta que `recommend` responde 200 en una racha de
+conexiones independientes. Si un escenario termina con respuestas no-200, el
+script sale con código 1.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.models import DEFAULT_BASE_COLS  # noqa: E402
+
+ACTIONS = ("fit", "recommend", "fit_and_recommend")
+# límites de los buckets del histograma (ms)
+HIST_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+# ---------- servidor ----------
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "src.api.main:app",
+           "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=str(project_root))
+
+
+def wait_ready(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {timeout:.0f}s")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ---------- carga ----------
+def make_payload(batch_size: int, rng: random.Random) -> bytes:
+    rows = [{c: rng.random() for c in DEFAULT_BASE_COLS} for _ in range(batch_size)]
+    return json.dumps({"data": rows}).encode("utf-8")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ACTIONS:
+            raise ValueError(f"Acción desconocida en --mix: {name!r} (use {ACTIONS})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Client:
+    """Conexión HTTP keep-alive por hilo."""
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.conn = http.client.HTTPConnection(host, port, timeout=60)
+
+    def post(self, path: str, body: bytes) -> int:
+        try:
+            self.conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            resp = self.conn.getresponse()
+            resp.read()
+            return resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            return 0
+
+
+def post_once(host: str, port: int, path: str, body: bytes) -> int:
+    """POST en una conexión propia (Connection: close): cada llamada puede caer en otro worker."""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        conn.request("POST", path, body=body,
+                     headers={"Content-Type": "application/json", "Connection": "close"})
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    except (OSError, http.client.HTTPException):
+        return 0
+    finally:
+        conn.close()
+
+
+def warmup(host: str, port: int, workers: int, payload: bytes) -> None:
+    # un keep-alive queda pegado a un solo worker: fit y sondeos van en conexiones nuevas
+    probes = 8 * workers
+    for _ in range(20 * workers):
+        for _ in range(workers):
+            post_once(host, port, "/pca?action=fit", payload)
+        if all(post_once(host, port, "/pca?action=recommend", payload) == 200 for _ in range(probes)):
+            return
+    raise RuntimeError("No se pudo entrenar el modelo en todos los workers durante el warmup")
+
+
+def run_load(host: str, port: int, mix: Dict[str, float], concurrency: int,
+             duration: float, batch_size: int, fit_rows: int,
+             seed: int) -> Tuple[List[Tuple[str, float, int]], float]:
+    actions, weights = zip(*mix.items())
+    results: List[Tuple[str, float, int]] = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(i: int) -> None:
+        rng = random.Random(seed + i)
+        client = Client(host, port)
+        # recommend usa `batch_size` zonas; fit y fit_and_recommend, `fit_rows`
+        payloads = {
+            "recommend": [make_payload(batch_size, rng) for _ in range(8)],
+            "fit": [make_payload(fit_rows, rng) for _ in range(2)],
+        }
+        payloads["fit_and_recommend"] = payloads["fit"]
+        local = []
+        while time.monotonic() < stop_at:
+            action = rng.choices(actions, weights)[0]
+            t0 = time.perf_counter()
+            status = client.post(f"/pca?action={action}", rng.choice(payloads[action]))
+            local.append((action, (time.perf_counter() - t0) * 1000.0, status))
+        with lock:
+            results.extend(local)
+
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(worker, range(concurrency)))
+    return results, time.monotonic() - t0
+
+
+# ---------- reporte ----------
+def summarize(lat_ms: np.ndarray, errors: int, elapsed: float,
+              status_counts: Dict[str, int]) -> Dict[str, Any]:
+    if len(lat_ms) == 0:
+        return {"requests": int(errors), "errors": int(errors), "status_counts": status_counts}
+    counts, _ = np.histogram(lat_ms, bins=[0.0] + HIST_BUCKETS_MS + [np.inf])
+    p50, p95, p99 = np.percentile(lat_ms, [50, 95, 99])
+    return {
+        "requests": int(len(lat_ms) + errors),
+        "errors": int(errors),
+        "status_counts": status_counts,
+        "throughput_rps": len(lat_ms) / elapsed,  # solo respuestas 200
+        "latency_ms": {
+            "mean": float(lat_ms.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(lat_ms.max()),
+        },
+        "histogram_ms": {
+            "le": HIST_BUCKETS_MS + ["inf"],
+            "counts": counts.tolist(),
+        },
+    }
+
+
+def report(results: List[Tuple[str, float, int]], elapsed: float) -> Dict[str, Any]:
+    out = {}
+    for name in (None,) + ACTIONS:
+        rows = [r for r in results if name is None or r[0] == name]
+        if name is not None and not rows:
+            continue
+        ok = np.array([lat for _, lat, st in rows if st == 200], dtype=float)
+        errors = sum(1 for _, _, st in rows if st != 200)
+        status_counts: Dict[str, int] = {}
+        for _, _, st in rows:
+            status_counts[str(st)] = status_counts.get(str(st), 0) + 1  # 0 = error de conexión
+        out[name or "all"] = summarize(ok, errors, elapsed, status_counts)
+    return out
+
+
+def print_table(label: str, rep: Dict[str, Any]) -> None:
+    print(f"\n== {label}")
+    print(f"{'action':<20}{'req':>8}{'err':>6}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, r in rep.items():
+        if "latency_ms" not in r:
+            print(f"{name:<20}{r['requests']:>8}{r['errors']:>6}")
+            continue
+        lat = r["latency_ms"]
+        print(f"{name:<20}{r['requests']:>8}{r['errors']:>6}{r['throughput_rps']:>10.1f}"
+              f"{lat['p50']:>9.2f}{lat['p95']:>9.2f}{lat['p99']:>9.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="Servidor ya levantado (no se inicia uvicorn)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1], help="Workers de uvicorn a probar")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[8])
+    ap.add_argument("--batch-size", type=int, nargs="+", default=[1], help="Zonas por petición recommend")
+    ap.add_argument("--duration", type=float, default=10.0, help="Segundos por escenario")
+    ap.add_argument("--mix", default="recommend=8,fit=1,fit_and_recommend=1")
+    ap.add_argument("--fit-rows", type=int, default=200, help="Zonas por petición fit / fit_and_recommend")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="loadtest_report.json")
+    args = ap.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    fit_payload = make_payload(args.fit_rows, random.Random(args.seed))
+    scenarios = []
+
+    worker_opts = [None] if args.url else args.workers
+    for workers in worker_opts:
+        proc = None
+        if args.url:
+            u = urlparse(args.url)
+            host, port = u.hostname, u.port or 80
+        else:
+            host, port = "127.0.0.1", args.port
+            proc = start_server(port, workers)
+        try:
+            wait_ready(host, port)
+            warmup(host, port, workers or 1, fit_payload)
+            for conc in args.concurrency:
+                for batch in args.batch_size:
+                    results, elapsed = run_load(host, port, mix, conc, args.duration, batch,
+                                                args.fit_rows, args.seed)
+                    rep = report(results, elapsed)
+                    label = f"workers={workers or 'ext'} concurrency={conc} batch={batch}"
+                    print_table(label, rep)
+                    scenarios.append({
+                        "workers": workers, "concurrency": conc, "batch_size": batch,
+                        "duration_s": elapsed, "results": rep,
+                    })
+        finally:
+            if proc is not None:
+                stop_server(proc)
+
+    out = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {"mix": mix, "duration_s": args.duration, "fit_rows": args.fit_rows,
+                   "url": args.url, "python": sys.version.split()[0]},
+        "scenarios": scenarios,
+    }
+    Path(args.out).write_text(json.dumps(out, indent=2))
+    print(f"\nReporte guardado en {args.out}")
+
+    failed = [s for s in scenarios if s["results"]["all"]["errors"]]
+    for s in failed:
+        print(f"ERROR: workers={s['workers'] or 'ext'} concurrency={s['concurrency']} "
+              f"batch={s['batch_size']} tuvo {s['results']['all']['errors']} respuestas no-200 "
+              f"{s['results']['all']['status_counts']}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Server-side micro-batching of small concurrent recommend calls"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ..models import PCARecommender
+
+
+class MicroBatcher:
+    """
+    Junta peticiones pequeñas concurrentes durante `max_wait_ms` (o hasta
+    `max_batch_rows` filas), corre un solo transform() sobre la matriz
+    combinada y devuelve a cada llamada su propio slice.
+    """
+    def __init__(self,
+                 get_model: Callable[[], PCARecommender],
+                 max_wait_ms: float = 2.0,
+                 max_batch_rows: int = 512):
+        self.get_model = get_model
+        self.max_wait = float(max_wait_ms) / 1000.0
+        self.max_batch_rows = int(max_batch_rows)
+        self._queue: "queue.Queue[Tuple[pd.DataFrame, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, get_model: Callable[[], PCARecommender]) -> Optional["MicroBatcher"]:
+        """Opt-in: solo se activa si PCA_MICROBATCH_WAIT_MS > 0."""
+        wait_ms = float(os.getenv("PCA_MICROBATCH_WAIT_MS", "0") or 0)
+        if wait_ms <= 0:
+            return None
+        max_rows = int(os.getenv("PCA_MICROBATCH_MAX_ROWS", "512"))
+        return cls(get_model, max_wait_ms=wait_ms, max_batch_rows=max_rows)
+
+    def accepts(self, df: pd.DataFrame) -> bool:
+        return len(df) < self.max_batch_rows
+
+    def submit(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Bloquea hasta que el batch que contiene `df` fue procesado."""
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((df, fut))
+        return fut.result()
+
+    # ---------- worker ----------
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="pca-microbatcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[pd.DataFrame, Future]]:
+        items = [self._queue.get()]
+        n_rows = len(items[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n_rows < self.max_batch_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+        return items
+
+    def _run(self) -> None:
+        while True:
+            items = self._collect()
+            try:
+                self._process(items)
+            except Exception:
+                # una petición inválida no debe tumbar al resto del batch
+                for item in items:
+                    if item[1].done():
+                        continue
+                    try:
+                        self._process([item])
+                    except Exception as e:
+                        item[1].set_exception(e)
+
+    def _process(self, items: List[Tuple[pd.DataFrame, Future]]) -> None:
+        frames = [df for df, _ in items]
+        big = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        res = self.get_model().transform(big)
+
+        start = 0
+        for df, fut in items:
+            stop = start + len(df)
+            part = dict(res)
+            part["recommendations"] = res["recommendations"].iloc[start:stop].reset_index(drop=True)
+            part["scores"] = res["scores"].iloc[start:stop].reset_index(drop=True)
+            fut.set_result(part)
+            start = stop
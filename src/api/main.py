@@ -1,11 +1,21 @@
 """FastAPI application for Urban PCA Recommender"""
 
-from fastapi import HTTPException, Query
+import hashlib
+import logging
+import os
+import threading
+
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request
 import pandas as pd
 from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
 
-from .schemas import Payload
-from ..models import PCARecommender, DEFAULT_BASE_COLS
+from .schemas import AllocatePayload, NearestPayload, Payload, SimulatePayload, ZoneIdsPayload
+from .batching import MicroBatcher
+from .shadow import ShadowScorer
+from .streaming import NDJSONStreamingResponse, stream_recommendations, DEFAULT_STREAM_BATCH
+from ..models import (PCARecommender, DEFAULT_BASE_COLS, DriftMonitor, PriorityRanker,
+                      RecommendationStore, ZoneLocator)
 
 app = FastAPI(
     title="Urban PCA Recommender",
@@ -14,7 +24,92 @@ app = FastAPI(
 )
 
 # Initialize the recommender model
-recommender = PCARecommender(cols=DEFAULT_BASE_COLS, var_target=0.80, top_k_loadings=5)
+MODEL_VERSION_BASE = os.getenv("PCA_MODEL_VERSION", "v1.0")
+
+
+def _new_recommender(model_version: str = MODEL_VERSION_BASE) -> PCARecommender:
+    return PCARecommender(cols=DEFAULT_BASE_COLS, var_target=0.80, top_k_loadings=5,
+                          model_version=model_version)
+
+
+def _fit_version(df: pd.DataFrame) -> str:
+    """Versión por fit: base + hash de los datos de entrenamiento (igual en todos los workers)."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return f"{MODEL_VERSION_BASE}+{digest.hexdigest()[:10]}"
+
+
+recommender = _new_recommender()
+_publish_lock = threading.Lock()
+
+# Micro-batching opt-in de recomendaciones pequeñas (PCA_MICROBATCH_WAIT_MS > 0)
+batcher = MicroBatcher.from_env(lambda: recommender)
+
+# Recomendaciones precalculadas por zone_id, reconstruidas tras cada fit
+store = RecommendationStore(os.getenv("PCA_STORE_PATH", ":memory:"))
+# Catálogo fijo de zonas (CSV/Parquet con zone_id); también reemplazable con PUT /catalog
+if os.getenv("PCA_CATALOG_PATH") and not store.load_catalog(os.environ["PCA_CATALOG_PATH"]):
+    raise RuntimeError("PCA_CATALOG_PATH no tiene filas con zone_id.")
+_store_cache: Dict[str, Any] = {}
+
+# Drift del tráfico de recommend contra los datos del último fit
+drift = DriftMonitor(sample_rate=float(os.getenv("PCA_DRIFT_SAMPLE_RATE", "1.0")))
+logger = logging.getLogger(__name__)
+
+
+def _observe_drift(df: pd.DataFrame) -> None:
+    """Bookkeeping de drift tras responder: un fallo aquí nunca rompe una recomendación servida."""
+    try:
+        drift.update(df)
+    except Exception:
+        logger.exception("Fallo al actualizar el monitor de drift")
+
+
+def _cached(name: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+    """Índices en memoria sobre el store (ranker, locator), reconstruidos solo cuando el store cambia."""
+    info = store.info()
+    if not info["n_zones"]:
+        raise HTTPException(status_code=422, detail="El store está vacío: carga un catálogo (PUT /catalog o PCA_CATALOG_PATH) y entrena.")
+    built_at, obj = _store_cache.get(name, (None, None))
+    if built_at != info["built_at"]:
+        obj = build(store.frame())
+        _store_cache[name] = (info["built_at"], obj)
+    return obj
+
+
+def _ranker() -> PriorityRanker:
+    return _cached("ranker", PriorityRanker)
+
+
+def _locator() -> ZoneLocator:
+    try:
+        return _cached("locator", ZoneLocator.from_frame)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# Modelo candidato en sombra (opcional), puntuado fuera del camino de la respuesta
+shadow = ShadowScorer.from_env()
+
+
+def _publish(model: PCARecommender, data: pd.DataFrame, background_tasks: BackgroundTasks) -> None:
+    """
+    Reemplaza el modelo que sirve por uno ya entrenado (swap de referencia: las
+    peticiones en curso terminan con el modelo anterior), re-referencia drift y
+    re-puntúa el catálogo fijo del store en segundo plano.
+    """
+    global recommender
+    # swap y snapshot del catálogo juntos: la generación del store sigue el orden de publicación
+    with _publish_lock:
+        recommender = model
+        drift.reset(model, reference=data)
+        catalog, generation = store.snapshot()
+    if catalog is not None:
+        background_tasks.add_task(store.rebuild, model, catalog=catalog, generation=generation)
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # NaN no es JSON válido
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
 
 
 @app.get("/", summary="Health check")
@@ -35,13 +130,19 @@ class Action(str, Enum):
     "/pca",
     summary="Entrena el PCA y/o genera recomendaciones según 'action'"
 )
-def pca(payload: Payload, action: Action = Query(default=Action.fit_and_recommend)):
+def pca(payload: Payload,
+        background_tasks: BackgroundTasks,
+        action: Action = Query(default=Action.fit_and_recommend)):
     """
     Usa el mismo payload para entrenar el modelo PCA y/o generar recomendaciones.
     action:
       - 'fit'               -> solo entrena
       - 'recommend'         -> solo recomienda (requiere modelo ya entrenado)
       - 'fit_and_recommend' -> entrena y recomienda en la misma llamada
+    Tras cada fit el catálogo fijo del store (PUT /catalog) se vuelve a
+    materializar en segundo plano con el modelo nuevo.
+    Con un candidato en sombra activo, una muestra de 'recommend' se puntúa
+    también con él después de enviar la respuesta.
     """
     df = pd.DataFrame([r.model_dump() for r in payload.data])
 
@@ -49,19 +150,28 @@ def pca(payload: Payload, action: Action = Query(default=Action.fit_and_recommen
         response = {"status": "ok"}
 
         # 1) Entrenamiento
+        model = recommender
         if action in (Action.fit, Action.fit_and_recommend):
-            recommender.fit(df)
+            model = _new_recommender(_fit_version(df)).fit(df)
+            _publish(model, df, background_tasks)
             response.update({
                 "fit": {
-                    "n_components": len(recommender.pca.components_),
-                    "explained": recommender.explained_.to_dict(orient="records"),
-                    "columns_used": recommender.cols_used_,
+                    "n_components": len(model.pca.components_),
+                    "explained": model.explained_.to_dict(orient="records"),
+                    "columns_used": model.cols_used_,
                 }
             })
 
         # 2) Recomendaciones
         if action in (Action.recommend, Action.fit_and_recommend):
-            res = recommender.transform(df)
+            if action == Action.recommend and batcher is not None and batcher.accepts(df):
+                res = batcher.submit(df)
+            else:
+                res = model.transform(df)
+            if action == Action.recommend:
+                background_tasks.add_task(_observe_drift, df)
+                if shadow.candidate is not None:
+                    background_tasks.add_task(shadow.submit, df, res["recommendations"])
             response.update({
                 "recommend": {
                     "model_version": res["model_version"],
@@ -75,4 +185,243 @@ def pca(payload: Payload, action: Action = Query(default=Action.fit_and_recommen
         return response
 
     except Exception as e:
-        raise HTTPException(status_code=422, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post(
+    "/simulate",
+    summary="Simula intervenciones (zonas x variables x deltas) sobre el modelo entrenado"
+)
+def simulate(payload: SimulatePayload):
+    """
+    Calcula, para cada zona, variable y delta, el nuevo componente débil, la
+    nueva recomendación y el cambio de ranking proyectado, sin reentrenar ni
+    re-ejecutar imputer/scaler/PCA por escenario.
+    """
+    df = pd.DataFrame([r.model_dump() for r in payload.data])
+    try:
+        res = recommender.simulate(df, payload.features, payload.deltas)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    sims = res["simulations"]
+    summary = (sims.groupby(["feature", "delta"], sort=False)
+               [["weak_changed", "recommendation_changed"]].sum().reset_index())
+    if payload.changed_only:
+        sims = sims[sims["recommendation_changed"]]
+    return {
+        "status": "ok",
+        "model_version": res["model_version"],
+        "summary": summary.to_dict(orient="records"),
+        "simulations": sims.to_dict(orient="records"),
+    }
+
+
+@app.put(
+    "/catalog",
+    summary="Reemplaza el catálogo fijo de zonas que se materializa en el store"
+)
+def put_catalog(payload: Payload, background_tasks: BackgroundTasks):
+    """
+    Filas con zone_id (más variables y opcionalmente segment, lat, lon). Es
+    independiente de los datos de entrenamiento: cada fit re-puntúa este catálogo.
+    Con un modelo ya entrenado, el store se reconstruye en segundo plano.
+    """
+    df = pd.DataFrame([r.model_dump() for r in payload.data])
+    with _publish_lock:
+        if not store.set_catalog(df):
+            raise HTTPException(status_code=422, detail="Las filas del catálogo deben incluir zone_id.")
+        catalog, generation = store.snapshot()
+        model = recommender
+    if model.pca is not None:
+        background_tasks.add_task(store.rebuild, model, catalog=catalog, generation=generation)
+    return {"status": "ok", "n_zones": len(catalog)}
+
+
+@app.get(
+    "/rankings",
+    summary="Top-k de zonas más urgentes por intervención (sobre el store)"
+)
+def rankings(k: int = Query(default=100, ge=1),
+             intervention: Optional[str] = Query(default=None, description="Solo esta intervención (p. ej. Escuelas)"),
+             by: str = Query(default="worst_feature_z", pattern="^(worst_feature_z|weak_score)$"),
+             segment: Optional[str] = None,
+             bbox: Optional[str] = Query(default=None, description="min_lon,min_lat,max_lon,max_lat")):
+    """Sin `intervention` devuelve un top-k por cada recommended_intervention."""
+    ranker = _ranker()
+    try:
+        box = [float(v) for v in bbox.split(",")] if bbox else None
+        if box is not None and len(box) != 4:
+            raise ValueError("bbox debe ser min_lon,min_lat,max_lon,max_lat")
+        if intervention is not None:
+            tops = {intervention: ranker.top_k(k, intervention=intervention, by=by, segment=segment, bbox=box)}
+        else:
+            tops = ranker.top_k_per_intervention(k, by=by, segment=segment, bbox=box)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        "status": "ok",
+        "store": store.info(),
+        "rankings": {i: _records(t) for i, t in tops.items()},
+    }
+
+
+@app.post(
+    "/allocate",
+    summary="Asignación greedy de un presupuesto de intervenciones entre zonas del store"
+)
+def allocate(payload: AllocatePayload):
+    """Maximiza la reducción total de déficit (-worst_feature_z) por unidad de costo."""
+    ranker = _ranker()
+    try:
+        chosen, totals = ranker.allocate(payload.budget,
+                                         costs=payload.costs,
+                                         max_per_intervention=payload.max_per_intervention,
+                                         segment=payload.segment,
+                                         bbox=payload.bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    by_interv = chosen.groupby("recommended_intervention").size().to_dict() if len(chosen) else {}
+    return {
+        "status": "ok",
+        "store": store.info(),
+        "totals": totals,
+        "by_intervention": by_interv,
+        "allocations": _records(chosen),
+    }
+
+
+@app.post(
+    "/recommendations/nearest",
+    summary="Recomendación de la(s) zona(s) más cercana(s) a puntos GPS"
+)
+def nearest_recommendations(payload: NearestPayload):
+    """
+    Busca en un BallTree haversine sobre los centroides (lat/lon) del store:
+    k vecinos por punto o, con `radius_m`, todas las zonas dentro del radio.
+    """
+    locator = _locator()
+    lat = [p.lat for p in payload.points]
+    lon = [p.lon for p in payload.points]
+    if payload.radius_m is not None:
+        ids, dists = locator.within(lat, lon, payload.radius_m)
+    else:
+        ids, dists = locator.nearest(lat, lon, k=payload.k)
+
+    found = store.get_many({z for row in ids for z in row})
+    results = []
+    for p, row_ids, row_d in zip(payload.points, ids, dists):
+        results.append({
+            "lat": p.lat,
+            "lon": p.lon,
+            "matches": [dict(found[z], distance_m=float(d)) for z, d in zip(row_ids, row_d) if z in found],
+        })
+    return {"status": "ok", "store": store.info(), "results": results}
+
+
+@app.get(
+    "/recommendations/{zone_id}",
+    summary="Recomendación precalculada de una zona del catálogo"
+)
+def get_recommendation(zone_id: str):
+    """Lookup O(1) en el store materializado con el último modelo."""
+    rec = store.get(zone_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail=f"Zona '{zone_id}' no está en el store.")
+    return rec
+
+
+@app.post(
+    "/recommendations/lookup",
+    summary="Recomendaciones precalculadas para una lista de zonas"
+)
+def lookup_recommendations(payload: ZoneIdsPayload):
+    """Devuelve las zonas encontradas (en el orden pedido) y los ids faltantes."""
+    found = store.get_many(payload.zone_ids)
+    return {
+        "status": "ok",
+        "store": store.info(),
+        "recommendations": [found[z] for z in payload.zone_ids if z in found],
+        "missing": [z for z in payload.zone_ids if z not in found],
+    }
+
+
+@app.post(
+    "/pca/stream",
+    summary="Recomendaciones en streaming (NDJSON de entrada y salida)"
+)
+async def pca_stream(request: Request,
+                     batch_size: int = Query(default=DEFAULT_STREAM_BATCH, ge=1, le=100_000)):
+    """
+    Recibe zonas como NDJSON (un registro por línea o chunks columnares
+    {"COL": [..], ...}) y responde NDJSON, una recomendación por zona, en
+    micro-batches de `batch_size` mientras la entrada sigue llegando.
+    Requiere modelo ya entrenado.
+    """
+    if recommender.pca is None:
+        raise HTTPException(status_code=422, detail="Debes llamar fit() antes de transform().")
+    return NDJSONStreamingResponse(
+        stream_recommendations(recommender, request.stream(), batch_size, monitor=drift)
+    )
+
+
+@app.get(
+    "/drift",
+    summary="Drift del tráfico de recommend respecto a los datos de entrenamiento"
+)
+def drift_report():
+    """
+    Por variable: tasa de NaN, media/std corridas, desplazamiento de la media en
+    unidades del scaler y PSI contra los bins de entrenamiento.
+    """
+    return {"status": "ok", "drift": drift.report()}
+
+
+@app.post(
+    "/shadow",
+    summary="Entrena un modelo candidato y lo pone en sombra sobre el tráfico de recommend"
+)
+def shadow_fit(payload: Payload,
+               model_version: str = Query(..., description="Versión del candidato"),
+               sample_rate: Optional[float] = Query(default=None, gt=0, le=1)):
+    """El modelo que sirve no cambia hasta llamar a /shadow/promote."""
+    df = pd.DataFrame([r.model_dump() for r in payload.data])
+    try:
+        candidate = _new_recommender(model_version).fit(df)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    shadow.set_candidate(candidate, data=df, sample_rate=sample_rate)
+    return {"status": "ok", "shadow": shadow.report(recommender.model_version)}
+
+
+@app.get(
+    "/shadow",
+    summary="Desacuerdos del candidato en sombra frente al modelo que sirve"
+)
+def shadow_report():
+    """Tasas de desacuerdo globales, por weak_component y por recommended_intervention."""
+    return {"status": "ok", "shadow": shadow.report(recommender.model_version)}
+
+
+@app.post(
+    "/shadow/promote",
+    summary="Promueve el candidato en sombra a modelo que sirve"
+)
+def shadow_promote(background_tasks: BackgroundTasks):
+    report = shadow.report(recommender.model_version)
+    data = shadow.candidate_data
+    candidate = shadow.clear()
+    if candidate is None:
+        raise HTTPException(status_code=404, detail="No hay candidato en sombra.")
+    _publish(candidate, data, background_tasks)
+    return {"status": "ok", "model_version": candidate.model_version, "shadow": report}
+
+
+@app.delete(
+    "/shadow",
+    summary="Descarta el candidato en sombra"
+)
+def shadow_clear():
+    if shadow.clear() is None:
+        raise HTTPException(status_code=404, detail="No hay candidato en sombra.")
+    return {"status": "ok"}
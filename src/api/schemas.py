@@ -1,11 +1,15 @@
 """Pydantic schemas for API requests and responses"""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Record(BaseModel):
     """Schema for a single urban zone record with infrastructure metrics"""
+    zone_id: Optional[str] = Field(default=None, description="Id estable de la zona en el catálogo")
+    segment: Optional[str] = Field(default=None, description="Segmento de la zona (alcaldía, colonia, ...)")
+    lat: Optional[float] = Field(default=None, description="Latitud del centroide de la zona")
+    lon: Optional[float] = Field(default=None, description="Longitud del centroide de la zona")
     GRAPROES: Optional[float] = None
     GRAPROES_F: Optional[float] = None
     GRAPROES_M: Optional[float] = None
@@ -31,3 +35,39 @@ class Record(BaseModel):
 class Payload(BaseModel):
     """Request payload containing multiple zone records"""
     data: List[Record] = Field(..., description="Lista de zonas con métricas")
+
+
+class ZoneIdsPayload(BaseModel):
+    """Request payload for bulk lookup of precomputed recommendations"""
+    zone_ids: List[str] = Field(..., description="Ids de zona a consultar")
+
+
+class SimulatePayload(BaseModel):
+    """Request payload for what-if intervention simulation"""
+    data: List[Record] = Field(..., description="Lista de zonas con métricas")
+    features: List[str] = Field(..., description="Variables a intervenir (p. ej. BANQUETA_C)")
+    deltas: List[float] = Field(..., description="Cambios a simular, en unidades de cada variable")
+    changed_only: bool = Field(default=False, description="Devolver solo escenarios donde cambia la recomendación")
+
+
+class AllocatePayload(BaseModel):
+    """Request payload for budgeted allocation of interventions across catalog zones"""
+    budget: float = Field(..., gt=0, description="Presupuesto total (en unidades de costo)")
+    costs: Dict[str, float] = Field(default_factory=dict, description="Costo por recommended_intervention (default 1)")
+    max_per_intervention: Optional[int] = Field(default=None, ge=0, description="Tope de zonas por tipo de intervención")
+    segment: Optional[str] = None
+    bbox: Optional[List[float]] = Field(default=None, min_length=4, max_length=4,
+                                        description="[min_lon, min_lat, max_lon, max_lat]")
+
+
+class Point(BaseModel):
+    """GPS point in decimal degrees"""
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
+class NearestPayload(BaseModel):
+    """Request payload for nearest-zone lookup"""
+    points: List[Point] = Field(..., description="Puntos a ubicar")
+    k: int = Field(default=1, ge=1, le=50, description="Zonas más cercanas por punto")
+    radius_m: Optional[float] = Field(default=None, gt=0, description="Si se da, todas las zonas dentro del radio")
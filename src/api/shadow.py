@@ -0,0 +1,233 @@
+"""Shadow scoring of a candidate model on sampled recommend traffic"""
+
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..models import PCARecommender
+from ..models.shadow_worker import sidecar_main
+
+
+class _Sidecar:
+    """
+    Proceso hijo de vida larga (spawn: no hereda hilos ni locks del servidor) con
+    prioridad de CPU reducida. El candidato se le envía una vez por generación,
+    no por muestra. Lo usa un solo hilo a la vez.
+    """
+    def __init__(self, nice: int):
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=sidecar_main, args=(child,), name="pca-shadow", daemon=True)
+        self.proc.start()
+        child.close()
+        # antes de que el hijo termine de importar: el arranque también corre con baja prioridad
+        if nice and hasattr(os, "setpriority"):
+            os.setpriority(os.PRIO_PROCESS, self.proc.pid, nice)
+        self._sent_generation = 0
+
+    def score(self, generation: int, candidate: PCARecommender,
+              df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        if generation != self._sent_generation:
+            self._conn.send(("candidate", candidate))
+            self._sent_generation = generation
+        return self._request("score", df)
+
+    def info(self) -> Dict[str, Any]:
+        """pid y módulos src.* cargados en el hijo (diagnóstico)."""
+        return self._request("info", None)
+
+    def _request(self, kind: str, payload: Any) -> Any:
+        self._conn.send((kind, payload))
+        status, result = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def close(self) -> None:
+        self._conn.close()
+        self.proc.join(timeout=5)
+
+
+class ShadowScorer:
+    """
+    Puntúa una copia muestreada del tráfico de recommend con un modelo candidato
+    en un proceso aparte (sidecar con menor prioridad de CPU), fuera del camino de
+    la respuesta y del GIL del servidor, y acumula los desacuerdos con el modelo
+    que sirve por weak_component y recommended_intervention.
+    Si el sidecar va atrasado (`max_pending`), las muestras se descartan en vez de encolarse.
+    """
+    def __init__(self, sample_rate: float = 0.1, max_pending: int = 4, nice: int = 19):
+        self.sample_rate = float(sample_rate)
+        self.max_pending = int(max_pending)
+        self.nice = int(nice)
+        self.candidate: Optional[PCARecommender] = None
+        self.candidate_data: Any = None
+        # un hilo que solo envía al sidecar y espera su respuesta (bloqueado en recv, sin GIL)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pca-shadow")
+        self._sidecar: Optional[_Sidecar] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._pending: Set[Future] = set()
+        self._reset_counters()
+
+    @classmethod
+    def from_env(cls) -> "ShadowScorer":
+        return cls(sample_rate=float(os.getenv("PCA_SHADOW_SAMPLE_RATE", "0.1")),
+                   max_pending=int(os.getenv("PCA_SHADOW_MAX_PENDING", "4")),
+                   nice=int(os.getenv("PCA_SHADOW_NICE", "19")))
+
+    def _reset_counters(self) -> None:
+        self.requests_sampled = 0
+        self.requests_dropped = 0
+        self.rows_compared = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        # clave -> [filas, desacuerdos weak_component, desacuerdos recommended_intervention]
+        self.by_component: Dict[str, np.ndarray] = {}
+        self.by_intervention: Dict[str, np.ndarray] = {}
+
+    # ---------- candidato ----------
+    def set_candidate(self, candidate: PCARecommender, data: Any = None,
+                      sample_rate: Optional[float] = None) -> None:
+        """Instala un candidato ya entrenado; `data` se guarda para re-referenciar al promoverlo."""
+        with self._lock:
+            self.candidate = candidate
+            self.candidate_data = data
+            self._generation += 1
+            if sample_rate is not None:
+                self.sample_rate = float(sample_rate)
+            self._reset_counters()
+
+    def clear(self) -> Optional[PCARecommender]:
+        """Quita el candidato; el sidecar sigue vivo para el próximo."""
+        with self._lock:
+            cand, self.candidate, self.candidate_data = self.candidate, None, None
+            self._generation += 1
+            self._reset_counters()
+        return cand
+
+    def close(self) -> None:
+        """Detiene el sidecar (también termina solo si el servidor muere)."""
+        self.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._sidecar is not None:
+            self._sidecar.close()
+            self._sidecar = None
+
+    # ---------- hot path ----------
+    def submit(self, df: pd.DataFrame, served: pd.DataFrame) -> bool:
+        """
+        Llamado tras responder con el modelo que sirve. Solo hace el muestreo y
+        el encolado; el transform del candidato corre en el sidecar.
+        """
+        cand = self.candidate
+        if cand is None or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if cand is not self.candidate:
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.requests_dropped += 1
+                return False
+            self.requests_sampled += 1
+            gen = self._generation
+            comp = served["weak_component"].to_numpy(dtype=object)
+            interv = served["recommended_intervention"].to_numpy(dtype=object)
+            fut = self._executor.submit(self._score, gen, cand, df)
+            self._pending.add(fut)
+        fut.add_done_callback(lambda f: self._merge(f, gen, comp, interv))
+        return True
+
+    # ---------- hilo del sidecar ----------
+    def _score(self, gen: int, cand: PCARecommender,
+               df: pd.DataFrame) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if gen != self._generation:
+            return None  # el candidato cambió mientras la muestra esperaba
+        if self._sidecar is None or not self._sidecar.proc.is_alive():
+            self._sidecar = _Sidecar(self.nice)  # arranque perezoso, o reinicio si murió
+        try:
+            return self._sidecar.score(gen, cand, df)
+        except (EOFError, OSError):
+            self._sidecar = None
+            raise RuntimeError("El proceso de sombra terminó inesperadamente.")
+
+    def _merge(self, fut: Future, gen: int, comp: np.ndarray, interv: np.ndarray) -> None:
+        stats, error = None, None
+        try:
+            shadow = fut.result()
+            if shadow is not None:
+                stats = np.column_stack([np.ones(len(comp), dtype=np.int64),
+                                         comp != shadow[0], interv != shadow[1]]).astype(np.int64)
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            self._pending.discard(fut)
+            if gen != self._generation or (stats is None and error is None):
+                return  # el candidato cambió mientras se puntuaba
+            if error is not None:
+                self.errors += 1
+                self.last_error = error
+                return
+            self.rows_compared += len(comp)
+            for key, table in ((comp, self.by_component), (interv, self.by_intervention)):
+                keys, inv = np.unique(key.astype(str), return_inverse=True)
+                sums = np.zeros((len(keys), 3), dtype=np.int64)
+                np.add.at(sums, inv, stats)
+                for k, row in zip(keys, sums):
+                    table[k] = table.get(k, np.zeros(3, dtype=np.int64)) + row
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Espera a que terminen (y se acumulen) las muestras encoladas (útil en tests y al promover)."""
+        # el resultado se acumula en el callback, después de que el future queda listo
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            left = None if deadline is None else deadline - time.monotonic()
+            if not pending or (left is not None and left <= 0):
+                return
+            done, _ = wait(pending, timeout=left)
+            if done:
+                time.sleep(0.001)
+
+    # ---------- reporte ----------
+    @staticmethod
+    def _table(table: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+        return {
+            k: {
+                "rows": int(v[0]),
+                "weak_component_disagreement": v[1] / v[0] if v[0] else None,
+                "intervention_disagreement": v[2] / v[0] if v[0] else None,
+            }
+            for k, v in sorted(table.items())
+        }
+
+    def report(self, serving_version: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if self.candidate is None:
+                return {"active": False}
+            totals = sum(self.by_component.values(), np.zeros(3, dtype=np.int64))
+            return {
+                "active": True,
+                "serving_model_version": serving_version,
+                "candidate_model_version": self.candidate.model_version,
+                "sample_rate": self.sample_rate,
+                "requests_sampled": self.requests_sampled,
+                "requests_dropped": self.requests_dropped,
+                "pending": len(self._pending),
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "rows_compared": self.rows_compared,
+                "weak_component_disagreement": totals[1] / totals[0] if totals[0] else None,
+                "intervention_disagreement": totals[2] / totals[0] if totals[0] else None,
+                "by_weak_component": self._table(self.by_component),
+                "by_recommended_intervention": self._table(self.by_intervention),
+            }
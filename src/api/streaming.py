@@ -0,0 +1,129 @@
+"""NDJSON streaming helpers for large recommend batches"""
+
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from ..models import DriftMonitor, PCARecommender
+
+
+DEFAULT_STREAM_BATCH = 5000
+logger = logging.getLogger(__name__)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Parsea el cuerpo como NDJSON mientras va llegando.
+    Solo mantiene en memoria la línea incompleta del último chunk.
+    """
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buf.strip():
+        yield json.loads(buf)
+
+
+def _is_columnar(obj: Dict[str, Any]) -> bool:
+    # chunk columnar: {"BANQUETA_C": [..], "ALUMPUB_C": [..], ...}
+    return bool(obj) and all(isinstance(v, list) for v in obj.values())
+
+
+async def iter_batches(records: AsyncIterator[Dict[str, Any]],
+                       batch_size: int) -> AsyncIterator[pd.DataFrame]:
+    """
+    Agrupa filas (una zona por línea) y/o chunks columnares en DataFrames
+    de tamaño fijo `batch_size`.
+    """
+    rows: List[Dict[str, Any]] = []
+    cols: List[pd.DataFrame] = []
+    n_pending = 0
+
+    def flush() -> pd.DataFrame:
+        nonlocal rows, cols, n_pending
+        parts = cols + ([pd.DataFrame(rows)] if rows else [])
+        df = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        rows, cols, n_pending = [], [], 0
+        return df
+
+    async for obj in records:
+        if not isinstance(obj, dict):
+            raise ValueError("Cada línea NDJSON debe ser un objeto JSON.")
+        if _is_columnar(obj):
+            if rows:
+                cols.append(pd.DataFrame(rows))
+                rows = []
+            cols.append(pd.DataFrame(obj))
+            n_pending += len(cols[-1])
+        else:
+            rows.append(obj)
+            n_pending += 1
+
+        while n_pending >= batch_size:
+            df = flush()
+            yield df.iloc[:batch_size].reset_index(drop=True)
+            rest = df.iloc[batch_size:].reset_index(drop=True)
+            if len(rest):
+                cols.append(rest)
+                n_pending = len(rest)
+
+    if n_pending:
+        yield flush()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no escucha desconexiones en paralelo: el cuerpo de
+    la petición se sigue leyendo (request.stream()) mientras se responde, y
+    ese listener consumiría los mensajes del body. La desconexión del cliente
+    llega igual como ClientDisconnect al leer el stream de entrada.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _records_to_ndjson(recs: pd.DataFrame, offset: int) -> bytes:
+    out = recs.replace({np.nan: None})
+    out.insert(0, "row", np.arange(offset, offset + len(out)))
+    lines = [json.dumps(r, ensure_ascii=False) for r in out.to_dict(orient="records")]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def stream_recommendations(recommender: PCARecommender,
+                                 chunks: AsyncIterator[bytes],
+                                 batch_size: int = DEFAULT_STREAM_BATCH,
+                                 monitor: Optional[DriftMonitor] = None) -> AsyncIterator[bytes]:
+    """
+    Recomienda en micro-batches a medida que llega la entrada y devuelve
+    NDJSON (una línea por zona). La memoria queda acotada por `batch_size`:
+    no se lee el siguiente chunk hasta que el anterior fue enviado al cliente.
+    """
+    offset = 0
+    try:
+        async for df in iter_batches(iter_ndjson(chunks), batch_size):
+            # transform es CPU-bound: fuera del event loop
+            res = await run_in_threadpool(recommender.transform, df)
+            if monitor is not None:
+                try:
+                    await run_in_threadpool(monitor.update, df)
+                except Exception:
+                    # el drift es bookkeeping: no corta un stream ya puntuado
+                    logger.exception("Fallo al actualizar el monitor de drift")
+            yield _records_to_ndjson(res["recommendations"], offset)
+            offset += len(df)
+    except Exception as e:
+        # la respuesta ya empezó: el error viaja como última línea
+        yield (json.dumps({"error": str(e), "row": offset}, ensure_ascii=False) + "\n").encode("utf-8")
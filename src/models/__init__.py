@@ -1,5 +1,10 @@
 """Models module for PCA Recommender"""
 
 from .pca_recommender import PCARecommender, DEFAULT_BASE_COLS, DEFAULT_INTERV_MAP
+from .store import RecommendationStore
+from .ranking import PriorityRanker
+from .drift import DriftMonitor
+from .geo import ZoneLocator
 
-__all__ = ["PCARecommender", "DEFAULT_BASE_COLS", "DEFAULT_INTERV_MAP"]
+__all__ = ["PCARecommender", "DEFAULT_BASE_COLS", "DEFAULT_INTERV_MAP", "RecommendationStore", "PriorityRanker",
+           "DriftMonitor", "ZoneLocator"]
@@ -0,0 +1,184 @@
+"""Streaming input-drift monitor for served traffic"""
+
+from __future__ import annotations
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.special import ndtr, ndtri
+
+from .pca_recommender import PCARecommender
+
+PSI_EPS = 1e-4
+
+
+class DriftMonitor:
+    """
+    Compara el tráfico servido contra la distribución de entrenamiento, por variable:
+    - momentos corridos (media/varianza, merge de Chan por batch) y tasa de NaN
+    - histograma sobre bins de referencia -> PSI
+    - desplazamiento de la media en unidades del scaler entrenado
+    Cada update es vectorizado y cuesta O(p log bins) por fila muestreada.
+    """
+    def __init__(self, n_bins: int = 10, sample_rate: float = 1.0,
+                 psi_alert: float = 0.2, seed: Optional[int] = None):
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate debe estar en (0, 1].")
+        self.n_bins = int(n_bins)
+        self.sample_rate = float(sample_rate)
+        self.psi_alert = float(psi_alert)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._generation = 0   # sube en cada reset(): invalida batches calculados con la referencia anterior
+
+        self.cols_: List[str] = []
+        self.model_version_: Optional[str] = None
+        self.train_mean_: Optional[np.ndarray] = None
+        self.train_scale_: Optional[np.ndarray] = None
+        self.edges_: List[np.ndarray] = []
+        self.ref_props_: List[np.ndarray] = []
+        self.ref_nan_rate_: Optional[np.ndarray] = None
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        p = len(self.cols_)
+        self.rows_seen_ = 0
+        self.rows_sampled_ = 0
+        self.n_ = np.zeros(p, dtype=np.int64)          # valores no-NaN por variable
+        self.nan_ = np.zeros(p, dtype=np.int64)
+        self.mean_ = np.zeros(p)
+        self.m2_ = np.zeros(p)
+        self.hist_ = [np.zeros(len(e) + 1, dtype=np.int64) for e in self.edges_]
+
+    @property
+    def is_ready(self) -> bool:
+        return bool(self.cols_)
+
+    # ---------- referencia ----------
+    def reset(self, recommender: PCARecommender, reference: Any = None) -> "DriftMonitor":
+        """
+        Toma la referencia del modelo entrenado. Con `reference` (datos de entrenamiento)
+        los bins son cuantiles empíricos; sin ella, se aproximan con una normal
+        (media/escala del scaler) y la tasa de NaN de referencia queda en 0.
+        """
+        recommender._check_fitted()
+        cols = list(recommender.cols_used_)
+        mean = np.asarray(recommender.scaler.mean_, dtype=float)
+        scale = np.asarray(recommender.scaler.scale_, dtype=float)
+        qs = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+
+        edges: List[np.ndarray] = []
+        props: List[np.ndarray] = []
+        if reference is not None:
+            X = PCARecommender._as_matrix(reference, cols, positional=cols)
+            nan_rate = np.isnan(X).mean(axis=0) if len(X) else np.zeros(len(cols))
+            for j in range(len(cols)):
+                col = X[:, j][~np.isnan(X[:, j])]
+                e = np.unique(np.quantile(col, qs)) if len(col) else np.array([mean[j]])
+                counts = np.bincount(np.searchsorted(e, col, side="right"), minlength=len(e) + 1)
+                edges.append(e)
+                props.append(counts / max(len(col), 1))
+        else:
+            nan_rate = np.zeros(len(cols))
+            z = np.concatenate([[-np.inf], ndtri(qs), [np.inf]])
+            cdf = np.diff(ndtr(z))
+            for j in range(len(cols)):
+                edges.append(mean[j] + scale[j] * z[1:-1])
+                props.append(cdf.copy())
+
+        with self._lock:
+            self.cols_ = cols
+            self.model_version_ = recommender.model_version
+            self.train_mean_, self.train_scale_ = mean, scale
+            self.edges_, self.ref_props_ = edges, props
+            self.ref_nan_rate_ = nan_rate
+            self._generation += 1
+            self._reset_counters()
+        return self
+
+    # ---------- updates ----------
+    def update(self, data: Any) -> int:
+        """
+        Acumula un batch de tráfico (cualquier entrada que acepte transform). Devuelve filas muestreadas.
+        Si un reset() ocurre mientras se calcula el batch, el batch se descarta (devuelve 0).
+        """
+        with self._lock:
+            if not self.cols_:
+                return 0
+            cols, edges, gen = self.cols_, self.edges_, self._generation
+        X = PCARecommender._as_matrix(data, cols, positional=cols)
+        n = len(X)
+        if self.sample_rate < 1.0:
+            X = X[self._rng.random(n) < self.sample_rate]
+        m = len(X)
+
+        # estadísticas del batch (vectorizadas sobre filas)
+        isnan = np.isnan(X)
+        b_n = (~isnan).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            b_mean = np.where(b_n > 0, np.nansum(X, axis=0) / np.maximum(b_n, 1), 0.0)
+        b_m2 = np.nansum((X - b_mean) ** 2, axis=0)
+        b_hist = []
+        for j, e in enumerate(edges):
+            col = X[:, j][~isnan[:, j]]
+            b_hist.append(np.bincount(np.searchsorted(e, col, side="right"), minlength=len(e) + 1))
+
+        with self._lock:
+            if gen != self._generation:
+                return 0  # la referencia cambió: estos bins/columnas ya no aplican
+            self.rows_seen_ += n
+            self.rows_sampled_ += m
+            # merge de Chan et al. para media/M2
+            tot = self.n_ + b_n
+            delta = b_mean - self.mean_
+            safe = np.maximum(tot, 1)
+            self.mean_ = self.mean_ + delta * b_n / safe
+            self.m2_ = self.m2_ + b_m2 + delta ** 2 * self.n_ * b_n / safe
+            self.n_ = tot
+            self.nan_ += isnan.sum(axis=0)
+            for h, bh in zip(self.hist_, b_hist):
+                h += bh
+        return m
+
+    # ---------- reporte ----------
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self.is_ready:
+                return {"ready": False}
+            features = []
+            for j, c in enumerate(self.cols_):
+                n, nan = int(self.n_[j]), int(self.nan_[j])
+                seen = n + nan
+                std = float(np.sqrt(self.m2_[j] / n)) if n else None
+                mean = float(self.mean_[j]) if n else None
+                psi = None
+                if n:
+                    a = np.maximum(self.hist_[j] / n, PSI_EPS)
+                    e = np.maximum(self.ref_props_[j], PSI_EPS)
+                    psi = float(np.sum((a - e) * np.log(a / e)))
+                features.append({
+                    "feature": c,
+                    "n": n,
+                    "nan_rate": nan / seen if seen else None,
+                    "ref_nan_rate": float(self.ref_nan_rate_[j]),
+                    "mean": mean,
+                    "std": std,
+                    "mean_shift_z": float((mean - self.train_mean_[j]) / self.train_scale_[j]) if n else None,
+                    "std_ratio": float(std / self.train_scale_[j]) if n else None,
+                    "psi": psi,
+                })
+            rows_seen, rows_sampled = self.rows_seen_, self.rows_sampled_
+
+        psis = [f["psi"] for f in features if f["psi"] is not None]
+        return {
+            "ready": True,
+            "model_version": self.model_version_,
+            "rows_seen": rows_seen,
+            "rows_sampled": rows_sampled,
+            "sample_rate": self.sample_rate,
+            "max_psi": max(psis) if psis else None,
+            "drifted_features": [f["feature"] for f in features
+                                 if f["psi"] is not None and f["psi"] > self.psi_alert],
+            "features": features,
+        }
+
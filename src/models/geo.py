@@ -0,0 +1,51 @@
+"""Nearest-zone lookup over block centroids (haversine ball tree)"""
+
+from __future__ import annotations
+from typing import List, Sequence, Tuple
+
+import numpy as np, pandas as pd
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_M = 6_371_008.8
+
+
+class ZoneLocator:
+    """
+    Índice espacial de centroides de zona (lat/lon en grados) con BallTree haversine.
+    Se construye una vez por dataset; las consultas son vectorizadas sobre lotes de puntos.
+    La zona "en la que está" un punto se aproxima por el centroide más cercano.
+    """
+    def __init__(self, zone_ids: Sequence[str], lat: Sequence[float], lon: Sequence[float], leaf_size: int = 40):
+        self.zone_ids = np.asarray(zone_ids, dtype=object)
+        coords = np.radians(np.column_stack([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)]))
+        if len(coords) == 0:
+            raise ValueError("No hay zonas con lat/lon para indexar.")
+        self.tree = BallTree(coords, leaf_size=leaf_size, metric="haversine")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, id_col: str = "zone_id") -> "ZoneLocator":
+        """Usa las filas con lat/lon válidos (p. ej. el contenido del store)."""
+        ok = df["lat"].notna() & df["lon"].notna()
+        sub = df[ok]
+        return cls(sub[id_col].astype(str).to_numpy(), sub["lat"].to_numpy(float), sub["lon"].to_numpy(float))
+
+    def __len__(self) -> int:
+        return len(self.zone_ids)
+
+    @staticmethod
+    def _points(lat: Sequence[float], lon: Sequence[float]) -> np.ndarray:
+        return np.radians(np.column_stack([np.atleast_1d(np.asarray(lat, dtype=float)),
+                                           np.atleast_1d(np.asarray(lon, dtype=float))]))
+
+    def nearest(self, lat: Sequence[float], lon: Sequence[float], k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """k zonas más cercanas por punto: (ids (m, k), distancias en metros (m, k))."""
+        k = min(int(k), len(self))
+        dist, idx = self.tree.query(self._points(lat, lon), k=k)
+        return self.zone_ids[idx], dist * EARTH_RADIUS_M
+
+    def within(self, lat: Sequence[float], lon: Sequence[float],
+               radius_m: float) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Zonas a menos de `radius_m` de cada punto, ordenadas por distancia."""
+        idx, dist = self.tree.query_radius(self._points(lat, lon), r=radius_m / EARTH_RADIUS_M,
+                                           return_distance=True, sort_results=True)
+        return [self.zone_ids[i] for i in idx], [d * EARTH_RADIUS_M for d in dist]
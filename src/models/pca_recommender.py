@@ -61,26 +61,85 @@ class PCARecommender:
         self.explained_: Optional[pd.DataFrame] = None
 
     # ---------- helpers ----------
+    # ----- adaptadores de entrada (pandas / NumPy / Arrow / Polars) -----
     @staticmethod
-    def _ensure_numeric(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
-        out = df.copy()
-        for c in cols:
-            out[c] = pd.to_numeric(out[c], errors="coerce")
-        return out
+    def _column_names(data: Any) -> Optional[List[str]]:
+        """Nombres de columna de la entrada; None si es un array 2-D posicional."""
+        if isinstance(data, pd.DataFrame):
+            return list(data.columns)
+        if isinstance(data, np.ndarray):
+            return list(data.dtype.names) if data.dtype.names else None
+        if hasattr(data, "column_names"):   # pyarrow.Table / RecordBatch
+            return list(data.column_names)
+        if hasattr(data, "get_column"):     # polars.DataFrame
+            return list(data.columns)
+        raise TypeError(f"Tipo de entrada no soportado: {type(data).__name__}")
+
+    @staticmethod
+    def _to_float(values: Any) -> np.ndarray:
+        """Columna -> float64 (NaN para faltantes/no numéricos), sin copiar si ya es float64."""
+        if isinstance(values, pd.Series):
+            if pd.api.types.is_numeric_dtype(values.dtype):
+                return values.to_numpy(dtype=float, na_value=np.nan)
+            return pd.to_numeric(values, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        arr = np.asarray(values)
+        if arr.dtype.kind in "fiub":
+            return arr.astype(float, copy=False)
+        return pd.to_numeric(pd.Series(arr), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    @classmethod
+    def _column(cls, data: Any, name: str) -> np.ndarray:
+        if isinstance(data, pd.DataFrame):
+            return cls._to_float(data[name])
+        if isinstance(data, np.ndarray):
+            return cls._to_float(data[name])
+        if hasattr(data, "column_names"):
+            return cls._to_float(data.column(name).to_numpy())
+        return cls._to_float(data.get_column(name).to_numpy())
+
+    @classmethod
+    def _as_matrix(cls, data: Any, cols: List[str], positional: List[str]) -> np.ndarray:
+        """
+        Matriz float64 (n, len(cols)) a partir de la entrada, sin pasar por copias
+        intermedias de pandas. Columnas faltantes -> NaN. Un array 2-D sin nombres
+        se interpreta con el orden de `positional`.
+        """
+        names = cls._column_names(data)
+        if names is None:
+            arr = np.asarray(data)
+            if arr.ndim != 2 or arr.shape[1] != len(positional):
+                raise ValueError(f"Se esperaba un array 2-D con {len(positional)} columnas: {positional}")
+            arr = arr if arr.dtype.kind in "fiub" else cls._to_float(arr.ravel()).reshape(arr.shape)
+            if cols == positional:
+                return arr.astype(float, copy=False)
+            return arr[:, [positional.index(c) for c in cols]].astype(float, copy=False)
+
+        if isinstance(data, pd.DataFrame) and set(cols) <= set(names) \
+                and all(data[c].dtype == np.float64 for c in cols):
+            return data[cols].to_numpy(dtype=float)  # ya numérico: sin conversión
+
+        present = set(names)
+        n = len(data)
+        X = np.empty((n, len(cols)), dtype=float)
+        for j, c in enumerate(cols):
+            X[:, j] = cls._column(data, c) if c in present else np.nan
+        return X
 
     def _pick_components(self, pca_full: PCA) -> int:
         cum = np.cumsum(pca_full.explained_variance_ratio_)
         return int(np.searchsorted(cum, self.var_target) + 1)
 
     # ---------- core ----------
-    def fit(self, df: pd.DataFrame) -> "PCARecommender":
+    def fit(self, df: Any) -> "PCARecommender":
+        """Acepta pandas/Polars DataFrame, pyarrow.Table o array NumPy (2-D en el orden de `cols`, o estructurado)."""
         # valida columnas presentes
-        cols_use = [c for c in self.cols if c in df.columns]
+        names = self._column_names(df)
+        cols_use = [c for c in self.cols if names is None or c in names]
         if not cols_use:
             raise ValueError("Ninguna de las columnas esperadas está en el DataFrame.")
-        self.cols_used_ = cols_use
 
-        X = self._ensure_numeric(df[self.cols_used_], self.cols_used_).values
+        X = self._as_matrix(df, cols_use, positional=self.cols)
+        self.cols_used_ = cols_use
 
         # imputar + escalar
         self.imputer = SimpleImputer(strategy="median")
@@ -114,44 +173,75 @@ class PCARecommender:
         })
         return self
 
-    def transform(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _check_fitted(self) -> None:
         if any(obj is None for obj in [self.imputer, self.scaler, self.pca, self.cols_used_]):
             raise RuntimeError("Debes llamar fit() antes de transform().")
 
-        # asegurar columnas (faltantes -> NaN)
-        Xdf = df.reindex(columns=self.cols_used_, fill_value=np.nan)
-        Xdf = self._ensure_numeric(Xdf, self.cols_used_)
+    def _project(self, df: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Imputa, escala y proyecta: devuelve (Xz, Z)."""
+        # asegurar columnas (faltantes -> NaN); arrays 2-D en el orden de cols_used_
+        X = self._as_matrix(df, self.cols_used_, positional=self.cols_used_)
 
-        X_imp = self.imputer.transform(Xdf.values)
+        X_imp = self.imputer.transform(X)
         Xz = self.scaler.transform(X_imp)
         Z = self.pca.transform(Xz)  # (n, k)
+        return Xz, Z
+
+    def _topvar_index(self, k: int) -> np.ndarray:
+        """Matriz (k, t) con los índices de columna de las top vars de cada componente (-1 = relleno)."""
+        rows = []
+        for i in range(k):
+            vars_k = self.comp_topvars_.get(f"PC{i+1}", self.cols_used_)  # fallback: todas
+            rows.append([self.cols_used_.index(v) for v in vars_k if v in self.cols_used_])
+        t = max((len(r) for r in rows), default=0)
+        idx = np.full((k, max(t, 1)), -1, dtype=np.intp)
+        for i, r in enumerate(rows):
+            idx[i, :len(r)] = r
+        return idx
+
+    @staticmethod
+    def _worst_in(Xz_g: np.ndarray, idx_g: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dados los z-scores ya recogidos en las top vars (..., t) y sus índices,
+        devuelve (índice de columna de la peor variable, su z). -1/NaN si no hay vars.
+        """
+        vals = np.where(idx_g >= 0, Xz_g, np.inf)
+        j = np.argmin(vals, axis=-1)
+        feat = np.take_along_axis(idx_g, j[..., None], axis=-1)[..., 0]
+        val = np.take_along_axis(vals, j[..., None], axis=-1)[..., 0]
+        val = np.where(feat >= 0, val, np.nan)
+        return feat, val
 
+    def _decide(self, Xz: np.ndarray, Z: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Componente más débil por fila y peor variable dentro de él (vectorizado)."""
         n, k = Z.shape
-        comp_names = np.array([f"PC{i+1}" for i in range(k)])
-        # componente más débil por fila (score mínimo)
-        weak_idx = np.argmin(Z, axis=1)              # (n,)
-        weak_comp = comp_names[weak_idx]             # (n,)
+        weak_idx = np.argmin(Z, axis=1)                    # (n,)
+        idx_g = self._topvar_index(k)[weak_idx]            # (n, t)
+        Xz_g = np.take_along_axis(Xz, np.maximum(idx_g, 0), axis=1)
+        feat, val = self._worst_in(Xz_g, idx_g)
+        return weak_idx, feat, val
+
+    def _feature_names(self, feat: np.ndarray) -> np.ndarray:
+        names = np.array(self.cols_used_ + [None], dtype=object)
+        return names[np.where(feat >= 0, feat, len(self.cols_used_))]
+
+    def _interventions(self, feat: np.ndarray) -> np.ndarray:
+        interv = np.array([self.interv_map.get(v, f"Mejorar '{v}'") for v in self.cols_used_]
+                          + ["Sin recomendación"], dtype=object)
+        return interv[np.where(feat >= 0, feat, len(self.cols_used_))]
+
+    def transform(self, df: Any) -> Dict[str, Any]:
+        self._check_fitted()
+        Xz, Z = self._project(df)
 
+        n, k = Z.shape
+        comp_names = np.array([f"PC{i+1}" for i in range(k)])
+        # componente más débil por fila (score mínimo) y
         # peor variable dentro del componente "débil"
-        # necesitamos mirar los z-scores de las top vars de ese comp por fila
-        worst_feature = []
-        worst_value = []
-        for i in range(n):
-            pc = weak_comp[i]
-            vars_k = self.comp_topvars_.get(pc, self.cols_used_)  # fallback: todas
-            # índices de columnas
-            ix = [self.cols_used_.index(v) for v in vars_k if v in self.cols_used_]
-            if not ix:
-                worst_feature.append(None)
-                worst_value.append(np.nan)
-                continue
-            row_vals = Xz[i, ix]
-            j = int(np.argmin(row_vals))
-            worst_feature.append(vars_k[j])
-            worst_value.append(float(row_vals[j]))
-
-        rec_interv = [self.interv_map.get(v, f"Mejorar '{v}'") if v is not None else "Sin recomendación"
-                      for v in worst_feature]
+        weak_idx, feat, worst_value = self._decide(Xz, Z)
+        weak_comp = comp_names[weak_idx]
+        worst_feature = self._feature_names(feat)
+        rec_interv = self._interventions(feat)
 
         # construir DataFrame de salida
         out = pd.DataFrame({
@@ -177,9 +267,80 @@ class PCARecommender:
             "columns_used": self.cols_used_
         }
 
-    def fit_transform(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def fit_transform(self, df: Any) -> Dict[str, Any]:
         return self.fit(df).transform(df)
 
+    # ---------- what-if ----------
+    def simulate(self, df: Any, features: List[str], deltas: List[float]) -> Dict[str, Any]:
+        """
+        Simula intervenciones zonas x features x deltas sin re-ejecutar el pipeline:
+        tras imputar, escalar+PCA es afín, así que sumar `d` a la variable j mueve
+        Xz[:, j] en d/scale_j y los scores en (d/scale_j) * components_[:, j].
+        Los deltas están en unidades originales de cada variable.
+        """
+        self._check_fitted()
+        unknown = [f for f in features if f not in self.cols_used_]
+        if unknown:
+            raise ValueError(f"Variables no usadas por el modelo: {unknown}")
+        fj = np.array([self.cols_used_.index(f) for f in features], dtype=np.intp)   # (f,)
+        d = np.asarray(deltas, dtype=float)                                            # (d,)
+
+        Xz, Z = self._project(df)
+        n, k = Z.shape
+        weak0, feat0, _ = self._decide(Xz, Z)
+        s0 = Z[np.arange(n), weak0]
+
+        # desplazamiento en z de la variable intervenida: (f, d)
+        dz = d[None, :] / self.scaler.scale_[fj][:, None]
+        # scores nuevos: (n, f, d, k)
+        Zs = Z[:, None, None, :] + dz[None, :, :, None] * self.pca.components_[:, fj].T[None, :, None, :]
+        weak1 = np.argmin(Zs, axis=-1)                                                  # (n, f, d)
+        s1 = np.take_along_axis(Zs, weak1[..., None], axis=-1)[..., 0]
+
+        # peor variable dentro del nuevo componente débil: solo cambia la columna intervenida
+        idx_g = self._topvar_index(k)[weak1]                                            # (n, f, d, t)
+        Xz_g = Xz[np.arange(n)[:, None, None, None], np.maximum(idx_g, 0)]
+        Xz_g = Xz_g + np.where(idx_g == fj[None, :, None, None], dz[None, :, :, None], 0.0)
+        feat1, val1 = self._worst_in(Xz_g, idx_g)
+
+        # ranking proyectado (1 = zona más deficitaria), moviendo solo la zona simulada
+        s_sorted = np.sort(s0)
+        rank0 = np.searchsorted(s_sorted, s0, side="left") + 1
+        rank1 = np.searchsorted(s_sorted, s1, side="left") - (s0[:, None, None] < s1) + 1
+
+        interv0 = self._interventions(feat0)
+        interv1 = self._interventions(feat1)
+        comp_names = np.array([f"PC{i+1}" for i in range(k)])
+        shape = (n, len(fj), len(d))
+
+        def flat(a: np.ndarray) -> np.ndarray:
+            return np.broadcast_to(a, shape).ravel()
+
+        sims = pd.DataFrame({
+            "zone": flat(np.arange(n)[:, None, None]),
+            "feature": flat(np.array(features, dtype=object)[None, :, None]),
+            "delta": flat(d[None, None, :]),
+            "weak_component": comp_names[weak1].ravel(),
+            "weak_score": s1.ravel(),
+            "worst_feature": self._feature_names(feat1).ravel(),
+            "worst_feature_z": val1.ravel(),
+            "recommended_intervention": interv1.ravel(),
+            "weak_changed": (weak1 != weak0[:, None, None]).ravel(),
+            "recommendation_changed": (interv1 != interv0[:, None, None]).ravel(),
+            "rank_before": flat(rank0[:, None, None]),
+            "rank_after": rank1.ravel(),
+        })
+        return {
+            "simulations": sims,
+            "baseline": pd.DataFrame({
+                "weak_component": comp_names[weak0],
+                "weak_score": s0,
+                "recommended_intervention": interv0,
+                "rank": rank0,
+            }),
+            "model_version": self.model_version,
+        }
+
     # ----- persistencia -----
     def save(self, path: str) -> None:
         payload = {
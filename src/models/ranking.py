@@ -0,0 +1,154 @@
+"""City-wide priority rankings and budgeted allocation over scored zones"""
+
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np, pandas as pd
+
+RANK_KEYS = ("worst_feature_z", "weak_score")
+
+
+class PriorityRanker:
+    """
+    Índice en memoria sobre zonas ya puntuadas (salida de transform() o del store):
+    - top_k(): las k zonas más urgentes, globales o por intervención, con argpartition
+    - allocate(): asignación greedy de un presupuesto de intervenciones
+    Más negativo = más urgente (tanto weak_score como worst_feature_z).
+    """
+    def __init__(self, recs: pd.DataFrame):
+        self.recs = recs.reset_index(drop=True)
+        self.scores = {
+            key: np.nan_to_num(self.recs[key].to_numpy(dtype=float, na_value=np.nan), nan=np.inf)
+            for key in RANK_KEYS
+        }
+        # varias variables pueden mapear a la misma intervención (GRAPROES* -> Escuelas);
+        # zonas sin variable recomendada quedan con código -1
+        interv = self.recs["recommended_intervention"].where(self.recs["worst_feature"].notna())
+        codes, self.interventions_ = pd.factorize(interv)
+        self.intervention_codes = codes
+        self.segment = self._opt_col("segment", object)
+        self.lat = self._opt_col("lat", float)
+        self.lon = self._opt_col("lon", float)
+
+    def _opt_col(self, name: str, dtype: type) -> Optional[np.ndarray]:
+        if name not in self.recs.columns or self.recs[name].isna().all():
+            return None
+        if dtype is float:
+            return self.recs[name].to_numpy(dtype=float, na_value=np.nan)
+        return self.recs[name].to_numpy(dtype=object)
+
+    # ---------- filtros ----------
+    def _mask(self,
+              intervention: Optional[str] = None,
+              segment: Optional[str] = None,
+              bbox: Optional[Sequence[float]] = None) -> np.ndarray:
+        mask = np.ones(len(self.recs), dtype=bool)
+        if intervention is not None:
+            hit = np.flatnonzero(self.interventions_ == intervention)
+            mask &= self.intervention_codes == (hit[0] if len(hit) else -2)
+        if segment is not None:
+            if self.segment is None:
+                raise ValueError("Las zonas no tienen 'segment'.")
+            mask &= self.segment == segment
+        if bbox is not None:
+            if self.lat is None or self.lon is None:
+                raise ValueError("Las zonas no tienen 'lat'/'lon'.")
+            min_lon, min_lat, max_lon, max_lat = bbox
+            mask &= (self.lon >= min_lon) & (self.lon <= max_lon) & (self.lat >= min_lat) & (self.lat <= max_lat)
+        return mask
+
+    @staticmethod
+    def _smallest(keys: np.ndarray, k: int) -> np.ndarray:
+        """Posiciones de los k valores menores, ordenadas (O(n + k log k))."""
+        if k <= 0 or len(keys) == 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(keys):
+            part = np.argpartition(keys, k - 1)[:k]
+        else:
+            part = np.arange(len(keys))
+        return part[np.argsort(keys[part], kind="stable")]
+
+    # ---------- rankings ----------
+    def top_k(self,
+              k: int,
+              intervention: Optional[str] = None,
+              by: str = "worst_feature_z",
+              segment: Optional[str] = None,
+              bbox: Optional[Sequence[float]] = None) -> pd.DataFrame:
+        """Las k zonas más urgentes según `by`, opcionalmente filtradas."""
+        if by not in self.scores:
+            raise ValueError(f"'by' debe ser uno de {RANK_KEYS}")
+        cand = np.flatnonzero(self._mask(intervention, segment, bbox))
+        keys = self.scores[by][cand]
+        sel = cand[self._smallest(keys, k)]
+        out = self.recs.iloc[sel].copy()
+        out.insert(0, "rank", np.arange(1, len(sel) + 1))
+        return out.reset_index(drop=True)
+
+    def top_k_per_intervention(self,
+                               k: int,
+                               by: str = "worst_feature_z",
+                               segment: Optional[str] = None,
+                               bbox: Optional[Sequence[float]] = None) -> Dict[str, pd.DataFrame]:
+        """Un top-k por cada recommended_intervention."""
+        return {i: self.top_k(k, intervention=i, by=by, segment=segment, bbox=bbox)
+                for i in self.interventions_}
+
+    # ---------- asignación ----------
+    def allocate(self,
+                 budget: float,
+                 costs: Optional[Dict[str, float]] = None,
+                 max_per_intervention: Optional[int] = None,
+                 segment: Optional[str] = None,
+                 bbox: Optional[Sequence[float]] = None) -> Tuple[pd.DataFrame, Dict[str, float]]:
+        """
+        Greedy: ordena zonas por déficit reducido / costo (déficit = -worst_feature_z)
+        y asigna la intervención recomendada de cada zona mientras alcance el presupuesto.
+        `costs` y `max_per_intervention` van por recommended_intervention (costo default 1).
+        """
+        costs = costs or {}
+        deficit = np.maximum(-self.scores["worst_feature_z"], 0.0)
+        interv_cost = np.array([float(costs.get(i, 1.0)) for i in self.interventions_] + [np.inf])
+        if (interv_cost <= 0).any():
+            raise ValueError("Los costos deben ser positivos.")
+        cost = interv_cost[self.intervention_codes]  # código -1 (sin recomendación) -> inf
+
+        cand = np.flatnonzero(self._mask(segment=segment, bbox=bbox) & (deficit > 0) & np.isfinite(cost))
+        order = cand[np.argsort(-(deficit[cand] / cost[cand]), kind="stable")]
+
+        used = np.zeros(len(self.interventions_), dtype=np.int64)
+        remaining = float(budget)
+        start = 0
+        chosen: List[int] = []
+        if max_per_intervention is None:
+            # prefijo que cabe completo en el presupuesto: sin loop de Python
+            start = int(np.searchsorted(np.cumsum(cost[order]), remaining, side="right"))
+            chosen = order[:start].tolist()
+            remaining -= float(cost[order[:start]].sum())
+
+        # resto greedy: saltar zonas cuyo costo ya no cabe
+        rest = order[start:]
+        min_cost = cost[rest].min() if len(rest) else np.inf
+        for i in rest:
+            if remaining < min_cost:
+                break
+            c = self.intervention_codes[i]
+            if cost[i] > remaining:
+                continue
+            if max_per_intervention is not None and used[c] >= max_per_intervention:
+                continue
+            chosen.append(int(i))
+            used[c] += 1
+            remaining -= float(cost[i])
+
+        sel = np.array(chosen, dtype=np.intp)
+        out = self.recs.iloc[sel].copy()
+        out["cost"] = cost[sel]
+        out["deficit_reduction"] = deficit[sel]
+        totals = {
+            "budget": float(budget),
+            "spent": float(budget) - remaining,
+            "n_interventions": len(sel),
+            "total_deficit_reduction": float(deficit[sel].sum()),
+        }
+        return out.reset_index(drop=True), totals
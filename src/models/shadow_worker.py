@@ -0,0 +1,37 @@
+"""Entry point of the shadow-scoring sidecar process"""
+
+from __future__ import annotations
+import os, sys
+from typing import Any, Optional
+
+from .pca_recommender import PCARecommender
+
+# Este módulo es lo único que importa el proceso hijo (spawn): vive fuera de src.api
+# para no construir una segunda app (store, monitores, ...) en el sidecar.
+
+
+def sidecar_main(conn: Any) -> None:
+    """
+    Bucle del proceso de sombra: recibe ("candidate", modelo), ("score", df) o
+    ("info", None) y responde a "score"/"info". Termina cuando el servidor cierra
+    el pipe (o muere).
+    """
+    candidate: Optional[PCARecommender] = None
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except (EOFError, OSError):
+            return
+        if kind == "candidate":
+            candidate = payload
+            continue
+        if kind == "info":
+            conn.send(("ok", {"pid": os.getpid(),
+                              "modules": sorted(m for m in sys.modules if m.split(".")[0] == "src")}))
+            continue
+        try:
+            recs = candidate.transform(payload)["recommendations"]
+            conn.send(("ok", (recs["weak_component"].to_numpy(dtype=object),
+                              recs["recommended_intervention"].to_numpy(dtype=object))))
+        except Exception as e:
+            conn.send(("error", str(e)))
@@ -0,0 +1,160 @@
+"""Precomputed per-zone recommendation store (SQLite, keyed by zone id)"""
+
+from __future__ import annotations
+import sqlite3, threading, time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from .pca_recommender import PCARecommender
+
+REC_COLUMNS = ["weak_component", "weak_score", "worst_feature", "worst_feature_z", "recommended_intervention"]
+# atributos opcionales de la zona que se copian del catálogo (filtros de ranking, geolocalización)
+ATTR_COLUMNS = ["segment", "lat", "lon"]
+
+
+class RecommendationStore:
+    """
+    Materializa las recomendaciones de un catálogo fijo de zonas (independiente
+    de los datos de entrenamiento: cada modelo nuevo re-puntúa el mismo catálogo):
+    - rebuild(): puntúa todo el catálogo con el modelo vigente y reemplaza la tabla en una transacción
+      (con generación: un rebuild más viejo que el ya confirmado no escribe)
+    - get()/get_many(): lookup O(1) por zone_id (PRIMARY KEY)
+    Cada fila queda estampada con el model_version que la generó.
+    """
+    def __init__(self, path: str = ":memory:", id_col: str = "zone_id"):
+        self.path = path
+        self.id_col = id_col
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._catalog: Optional[pd.DataFrame] = None
+        self._generation = 0   # último snapshot entregado
+        self._committed = 0    # generación del contenido actual de la tabla
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS zones ("
+                " zone_id TEXT PRIMARY KEY,"
+                " weak_component TEXT, weak_score REAL,"
+                " worst_feature TEXT, worst_feature_z REAL,"
+                " recommended_intervention TEXT,"
+                " segment TEXT, lat REAL, lon REAL,"
+                " model_version TEXT, built_at REAL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    # ---------- catálogo ----------
+    def set_catalog(self, df: pd.DataFrame) -> bool:
+        """Guarda las filas con zone_id como catálogo. Devuelve False si no hay ids."""
+        if self.id_col not in df.columns:
+            return False
+        cat = df[df[self.id_col].notna()]
+        if cat.empty:
+            return False
+        cat = cat.drop_duplicates(subset=self.id_col, keep="last").reset_index(drop=True)
+        cat[self.id_col] = cat[self.id_col].astype(str)
+        with self._lock:
+            self._catalog = cat
+        return True
+
+    def load_catalog(self, path: str) -> bool:
+        """Carga el catálogo desde CSV o Parquet (por extensión); zone_id se lee como texto."""
+        if path.endswith((".parquet", ".pq")):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, dtype={self.id_col: str})
+        return self.set_catalog(df)
+
+    @property
+    def has_catalog(self) -> bool:
+        return self._catalog is not None
+
+    def snapshot(self) -> Tuple[Optional[pd.DataFrame], int]:
+        """Catálogo vigente y una generación nueva (monótona) para pasarlos a rebuild()."""
+        with self._lock:
+            self._generation += 1
+            return self._catalog, self._generation
+
+    # ---------- materialización ----------
+    def rebuild(self, recommender: PCARecommender, catalog: Optional[pd.DataFrame] = None,
+                generation: Optional[int] = None) -> int:
+        """
+        Puntúa el catálogo completo y reemplaza el contenido del store.
+        En segundo plano, pasar `catalog`/`generation` tomados con snapshot() al
+        publicar el modelo: si al terminar ya se confirmó una generación más nueva,
+        el resultado se descarta (devuelve 0) en vez de pisarla.
+        """
+        if generation is None:
+            snap, generation = self.snapshot()
+            catalog = snap if catalog is None else catalog
+        if catalog is None:
+            return 0
+        cat = catalog
+        recs = recommender.transform(cat)["recommendations"]
+        attrs = cat.reindex(columns=ATTR_COLUMNS).astype(object)
+        attrs = attrs.where(attrs.notna(), None)
+        built_at = time.time()
+
+        rows = list(zip(
+            cat[self.id_col].tolist(),
+            recs["weak_component"].tolist(),
+            recs["weak_score"].astype(float).tolist(),
+            recs["worst_feature"].tolist(),
+            recs["worst_feature_z"].astype(float).tolist(),
+            recs["recommended_intervention"].tolist(),
+            *(attrs[c].tolist() for c in ATTR_COLUMNS),
+        ))
+        with self._lock, self._conn:
+            if generation <= self._committed:
+                return 0
+            self._conn.execute("DELETE FROM zones")
+            self._conn.executemany(
+                "INSERT INTO zones VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [r + (recommender.model_version, built_at) for r in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("model_version", recommender.model_version), ("built_at", repr(built_at))],
+            )
+            self._committed = generation
+        return len(rows)
+
+    # ---------- lectura ----------
+    _FIELDS = ["zone_id"] + REC_COLUMNS + ATTR_COLUMNS + ["model_version", "built_at"]
+    _SELECT = f"SELECT {', '.join(_FIELDS)} FROM zones"
+
+    def _row(self, r: tuple) -> Dict[str, Any]:
+        return dict(zip(self._FIELDS, r))
+
+    def get(self, zone_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            r = self._conn.execute(self._SELECT + " WHERE zone_id = ?", (str(zone_id),)).fetchone()
+        return self._row(r) if r is not None else None
+
+    def get_many(self, zone_ids: Iterable[str], chunk: int = 500) -> Dict[str, Dict[str, Any]]:
+        """Lookup por lista de ids; los ids inexistentes no aparecen en el resultado."""
+        ids = [str(z) for z in zone_ids]
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            # límite de parámetros de SQLite: consultar por bloques
+            for i in range(0, len(ids), chunk):
+                part = ids[i:i + chunk]
+                q = self._SELECT + f" WHERE zone_id IN ({','.join('?' * len(part))})"
+                for r in self._conn.execute(q, part):
+                    out[r[0]] = self._row(r)
+        return out
+
+    def frame(self) -> pd.DataFrame:
+        """Contenido completo del store como DataFrame."""
+        with self._lock:
+            rows = self._conn.execute(self._SELECT).fetchall()
+        return pd.DataFrame(rows, columns=self._FIELDS)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+            n = self._conn.execute("SELECT COUNT(*) FROM zones").fetchone()[0]
+        return {
+            "model_version": meta.get("model_version"),
+            "built_at": float(meta["built_at"]) if "built_at" in meta else None,
+            "n_zones": int(n),
+        }
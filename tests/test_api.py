@@ -7,14 +7,26 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import json
+
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
-from src.api.main import app
+from src.api.main import app, drift, shadow
+from src.models import DEFAULT_BASE_COLS
 
 
 client = TestClient(app)
 
 
+def _rows(n, seed, **extra):
+    """n zonas con DEFAULT_BASE_COLS uniformes en [0, 1); `extra` agrega columnas (valor o función de i)."""
+    X = np.random.default_rng(seed).random((n, len(DEFAULT_BASE_COLS)))
+    return [dict({c: float(v) for c, v in zip(DEFAULT_BASE_COLS, x)},
+                 **{k: f(i) if callable(f) else f for k, f in extra.items()})
+            for i, x in enumerate(X)]
+
+
 class TestAPI:
     """Test suite for API endpoints"""
     
@@ -153,3 +165,188 @@ class TestAPI:
         response = client.post("/recommend", json=payload)
         # Either succeeds or returns 422
         assert response.status_code in [200, 422]
+
+    def test_pca_stream_endpoint(self):
+        """Test NDJSON streaming recommendations in micro-batches"""
+        rows = _rows(20, seed=0)
+        fit = client.post("/pca", params={"action": "fit"}, json={"data": rows})
+        assert fit.status_code == 200
+
+        # 15 filas sueltas + un chunk columnar de 5
+        columnar = {c: [r[c] for r in rows[15:]] for c in DEFAULT_BASE_COLS}
+        body = "\n".join(json.dumps(r) for r in rows[:15]) + "\n" + json.dumps(columnar) + "\n"
+        response = client.post("/pca/stream", params={"batch_size": 4}, content=body.encode())
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(l) for l in response.text.splitlines() if l]
+        assert [l["row"] for l in lines] == list(range(20))
+        expected = client.post("/pca", params={"action": "recommend"}, json={"data": rows}).json()
+        got = [l["recommended_intervention"] for l in lines]
+        assert got == [r["recommended_intervention"] for r in expected["recommend"]["recommendations"]]
+
+    def test_pca_stream_reports_bad_line(self):
+        """Test that a malformed NDJSON line ends the stream with an error line"""
+        rows = _rows(20, seed=0)
+        fit = client.post("/pca", params={"action": "fit"}, json={"data": rows})
+        assert fit.status_code == 200
+
+        body = json.dumps(rows[0]).encode() + b"\nnot json\n"
+        response = client.post("/pca/stream", params={"batch_size": 1}, content=body)
+        assert response.status_code == 200
+
+        lines = [json.loads(l) for l in response.text.splitlines() if l]
+        assert lines[0]["row"] == 0
+        assert "error" in lines[-1]
+        assert lines[-1]["row"] == 1
+
+    def test_precomputed_recommendations(self):
+        """Test that each fit materializes the fixed zone catalog into the store"""
+        rows = _rows(12, seed=1, zone_id=lambda i: f"z{i}")
+        catalog = client.put("/catalog", json={"data": rows})
+        assert catalog.status_code == 200
+        assert catalog.json()["n_zones"] == 12
+        response = client.post("/pca", params={"action": "fit_and_recommend"}, json={"data": rows})
+        assert response.status_code == 200
+        live = response.json()["recommend"]["recommendations"]
+
+        single = client.get("/recommendations/z3")
+        assert single.status_code == 200
+        assert single.json()["recommended_intervention"] == live[3]["recommended_intervention"]
+        assert single.json()["model_version"] == response.json()["recommend"]["model_version"]
+
+        bulk = client.post("/recommendations/lookup", json={"zone_ids": ["z5", "nope", "z0"]})
+        assert bulk.status_code == 200
+        data = bulk.json()
+        assert [r["zone_id"] for r in data["recommendations"]] == ["z5", "z0"]
+        assert data["missing"] == ["nope"]
+        assert data["store"]["n_zones"] == 12
+
+        # refit con una muestra: el catálogo no cambia, todas las zonas se re-estampan
+        refit = client.post("/pca", params={"action": "fit_and_recommend"}, json={"data": rows[:10]})
+        version = refit.json()["recommend"]["model_version"]
+        assert version != response.json()["recommend"]["model_version"]
+        assert client.get("/recommendations/z3").json()["model_version"] == version
+        assert client.get("/recommendations/z11").json()["model_version"] == version
+        assert client.post("/recommendations/lookup", json={"zone_ids": []}).json()["store"]["n_zones"] == 12
+        assert client.get("/recommendations/nope").status_code == 404
+
+        no_ids = [{k: v for k, v in r.items() if k != "zone_id"} for r in rows]
+        assert client.put("/catalog", json={"data": no_ids}).status_code == 422
+
+    def test_simulate_endpoint(self):
+        """Test what-if simulation of interventions"""
+        rows = _rows(10, seed=2)
+        client.post("/pca", params={"action": "fit"}, json={"data": rows})
+
+        payload = {"data": rows, "features": ["BANQUETA_C", "ARBOLES_C"], "deltas": [0.0, 1.0]}
+        response = client.post("/simulate", json=payload)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["simulations"]) == 10 * 2 * 2
+        zero = [s for s in data["simulations"] if s["delta"] == 0.0]
+        assert not any(s["recommendation_changed"] for s in zero)
+        assert len(data["summary"]) == 4
+
+        bad = client.post("/simulate", json=dict(payload, features=["NOPE"]))
+        assert bad.status_code == 422
+
+    def test_rankings_and_allocate(self):
+        """Test citywide rankings and budgeted allocation over the store"""
+        rows = _rows(30, seed=4, zone_id=lambda i: f"r{i}", segment=lambda i: "a" if i % 2 else "b",
+                     lat=lambda i: 19.0 + i / 100, lon=lambda i: -99.0 - i / 100)
+        assert client.put("/catalog", json={"data": rows}).status_code == 200
+        assert client.post("/pca", params={"action": "fit"}, json={"data": rows}).status_code == 200
+
+        response = client.get("/rankings", params={"k": 3, "segment": "a"})
+        assert response.status_code == 200
+        rankings = response.json()["rankings"]
+        assert rankings
+        for intervention, top in rankings.items():
+            assert len(top) <= 3
+            assert all(z["recommended_intervention"] == intervention and z["segment"] == "a" for z in top)
+
+        intervention = next(iter(rankings))
+        response = client.get("/rankings", params={"k": 3, "intervention": intervention})
+        assert list(response.json()["rankings"]) == [intervention]
+
+        response = client.get("/rankings", params={"bbox": "1,2,3"})
+        assert response.status_code == 422
+
+        response = client.post("/allocate", json={"budget": 5, "max_per_intervention": 2})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["totals"]["n_interventions"] <= 5
+        counts = {}
+        for z in data["allocations"]:
+            counts[z["recommended_intervention"]] = counts.get(z["recommended_intervention"], 0) + 1
+        assert counts == data["by_intervention"]
+        assert all(v <= 2 for v in counts.values())
+
+    def test_drift_report(self, monkeypatch):
+        """Test that recommend traffic feeds the drift monitor"""
+        rows = _rows(50, seed=5)
+        client.post("/pca", params={"action": "fit"}, json={"data": rows})
+        shifted = [dict(r, BANQUETA_C=r["BANQUETA_C"] + 5.0) for r in rows]
+        assert client.post("/pca", params={"action": "recommend"}, json={"data": shifted}).status_code == 200
+
+        response = client.get("/drift")
+        assert response.status_code == 200
+        report = response.json()["drift"]
+        assert report["ready"]
+        assert report["rows_seen"] == 50
+        assert "BANQUETA_C" in report["drifted_features"]
+
+        # un fallo del monitor de drift no rompe recomendaciones ya puntuadas
+        def broken(df):
+            raise ValueError("operands could not be broadcast together")
+        monkeypatch.setattr(drift, "update", broken)
+        assert client.post("/pca", params={"action": "recommend"}, json={"data": rows}).status_code == 200
+        body = "\n".join(json.dumps(r) for r in rows).encode()
+        lines = [json.loads(l) for l in client.post("/pca/stream", content=body).text.splitlines() if l]
+        assert len(lines) == len(rows) and not any("error" in l for l in lines)
+
+    def test_nearest_recommendations(self):
+        """Test GPS point lookup against catalog zone centroids"""
+        rows = _rows(25, seed=6, zone_id=lambda i: f"g{i}",
+                     lat=lambda i: 19.40 + 0.01 * (i // 5), lon=lambda i: -99.10 - 0.01 * (i % 5))
+        assert client.put("/catalog", json={"data": rows}).status_code == 200
+        assert client.post("/pca", params={"action": "fit"}, json={"data": rows}).status_code == 200
+
+        points = [{"lat": 19.4001, "lon": -99.1001}, {"lat": 19.4398, "lon": -99.1402}]
+        response = client.post("/recommendations/nearest", json={"points": points, "k": 2})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["matches"][0]["zone_id"] for r in results] == ["g0", "g24"]
+        assert results[0]["matches"][0]["distance_m"] < 20
+        assert len(results[0]["matches"]) == 2
+        assert "recommended_intervention" in results[0]["matches"][0]
+
+        response = client.post("/recommendations/nearest", json={"points": points[:1], "radius_m": 1200})
+        ids = [m["zone_id"] for m in response.json()["results"][0]["matches"]]
+        assert ids[0] == "g0" and set(ids) == {"g0", "g1", "g5"}
+
+    def test_shadow_candidate_and_promote(self):
+        """Test shadow scoring of a candidate and promoting it"""
+        rows = _rows(30, seed=8)
+        client.post("/pca", params={"action": "fit"}, json={"data": rows})
+
+        response = client.post("/shadow", params={"model_version": "v2", "sample_rate": 1.0}, json={"data": rows})
+        assert response.status_code == 200
+        assert response.json()["shadow"]["candidate_model_version"] == "v2"
+
+        served = client.post("/pca", params={"action": "recommend"}, json={"data": rows})
+        assert served.json()["recommend"]["model_version"] != "v2"
+        shadow.flush(timeout=10)
+
+        report = client.get("/shadow").json()["shadow"]
+        assert report["rows_compared"] == 30
+        assert report["intervention_disagreement"] == 0
+
+        promoted = client.post("/shadow/promote")
+        assert promoted.status_code == 200
+        assert promoted.json()["model_version"] == "v2"
+        served = client.post("/pca", params={"action": "recommend"}, json={"data": rows})
+        assert served.json()["recommend"]["model_version"] == "v2"
+        assert client.get("/shadow").json()["shadow"] == {"active": False}
+        assert client.delete("/shadow").status_code == 404
@@ -0,0 +1,70 @@
+"""Tests for server-side micro-batching"""
+
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import pandas as pd
+import numpy as np
+from src.models import PCARecommender, DEFAULT_BASE_COLS
+from src.api.batching import MicroBatcher
+
+
+class TestMicroBatcher:
+    """Test suite for MicroBatcher"""
+
+    @pytest.fixture
+    def fitted(self):
+        np.random.seed(0)
+        df = pd.DataFrame({col: np.random.rand(40) for col in DEFAULT_BASE_COLS})
+        return PCARecommender().fit(df), df
+
+    def test_concurrent_calls_get_their_own_slice(self, fitted):
+        """Test that each caller receives exactly its rows, in order"""
+        rec, df = fitted
+        batcher = MicroBatcher(lambda: rec, max_wait_ms=20, max_batch_rows=64)
+        parts = [df.iloc[i:i + 3].reset_index(drop=True) for i in range(0, 30, 3)]
+
+        with ThreadPoolExecutor(max_workers=len(parts)) as ex:
+            results = list(ex.map(batcher.submit, parts))
+
+        for part, res in zip(parts, results):
+            expected = rec.transform(part)["recommendations"]
+            pd.testing.assert_frame_equal(res["recommendations"], expected)
+            assert len(res["scores"]) == len(part)
+
+    def test_bad_request_does_not_fail_batch(self, fitted):
+        """Test that an invalid request only fails its own caller"""
+        rec, df = fitted
+
+        class Picky:
+            def transform(self, X):
+                if "bad" in X.columns:
+                    raise ValueError("bad input")
+                return rec.transform(X)
+
+        batcher = MicroBatcher(Picky, max_wait_ms=20)
+        good = df.iloc[:2].reset_index(drop=True)
+        bad = pd.DataFrame({"bad": [1.0]})
+
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            f_good = ex.submit(batcher.submit, good)
+            f_bad = ex.submit(batcher.submit, bad)
+            assert len(f_good.result()["recommendations"]) == 2
+            with pytest.raises(ValueError):
+                f_bad.result()
+
+    def test_from_env_is_opt_in(self, monkeypatch):
+        """Test that batching is disabled unless configured"""
+        monkeypatch.delenv("PCA_MICROBATCH_WAIT_MS", raising=False)
+        assert MicroBatcher.from_env(PCARecommender) is None
+        monkeypatch.setenv("PCA_MICROBATCH_WAIT_MS", "2")
+        monkeypatch.setenv("PCA_MICROBATCH_MAX_ROWS", "128")
+        batcher = MicroBatcher.from_env(PCARecommender)
+        assert batcher.max_batch_rows == 128
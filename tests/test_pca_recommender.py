@@ -10,7 +10,7 @@ sys.path.insert(0, str(project_root))
 import pytest
 import pandas as pd
 import numpy as np
-from src.models import PCARecommender, DEFAULT_BASE_COLS
+from src.models import PCARecommender, DEFAULT_BASE_COLS, DEFAULT_INTERV_MAP
 
 
 class TestPCARecommender:
@@ -82,3 +82,304 @@ class TestPCARecommender:
         results = loaded_recommender.transform(sample_data)
         assert "recommendations" in results
         assert len(results["recommendations"]) == len(sample_data)
+
+
+class TestRecommendationStore:
+    """Test suite for RecommendationStore"""
+
+    def test_rebuild_and_lookup(self, tmp_path):
+        """Test materializing a catalog and reading it back by id"""
+        from src.models import RecommendationStore
+
+        np.random.seed(3)
+        df = pd.DataFrame({col: np.random.rand(15) for col in DEFAULT_BASE_COLS})
+        df["zone_id"] = [f"z{i}" for i in range(15)]
+        rec = PCARecommender(model_version="v-test").fit(df)
+
+        store = RecommendationStore(str(tmp_path / "store.sqlite"))
+        assert store.rebuild(rec) == 0  # sin catálogo
+        assert store.set_catalog(df)
+        assert store.rebuild(rec) == 15
+
+        expected = rec.transform(df)["recommendations"]
+        got = store.get("z7")
+        assert got["worst_feature"] == expected.loc[7, "worst_feature"]
+        assert got["model_version"] == "v-test"
+        assert set(store.get_many(["z1", "z2", "missing"])) == {"z1", "z2"}
+        assert store.get("missing") is None
+        assert store.info()["n_zones"] == 15
+
+    def test_load_catalog_from_csv(self, tmp_path):
+        """Test loading the fixed catalog from disk, keeping ids as text"""
+        from src.models import RecommendationStore
+
+        np.random.seed(5)
+        df = pd.DataFrame({col: np.random.rand(8) for col in DEFAULT_BASE_COLS})
+        df.insert(0, "zone_id", [f"{i:03d}" for i in range(8)])
+        df.to_csv(tmp_path / "catalog.csv", index=False)
+
+        store = RecommendationStore()
+        assert store.load_catalog(str(tmp_path / "catalog.csv"))
+        assert store.rebuild(PCARecommender().fit(df.iloc[:5])) == 8
+        assert store.get("007") is not None
+
+    def test_stale_rebuild_is_dropped(self):
+        """Test that a rebuild from an older generation does not overwrite a newer one"""
+        from src.models import RecommendationStore
+
+        np.random.seed(4)
+        df = pd.DataFrame({col: np.random.rand(10) for col in DEFAULT_BASE_COLS})
+        df["zone_id"] = [f"z{i}" for i in range(10)]
+        old = PCARecommender(model_version="v-old").fit(df)
+        new = PCARecommender(model_version="v-new").fit(df)
+
+        store = RecommendationStore()
+        store.set_catalog(df)
+        old_cat, old_gen = store.snapshot()
+        store.set_catalog(df.iloc[:6])
+        new_cat, new_gen = store.snapshot()
+        assert new_gen > old_gen
+
+        # el rebuild más nuevo confirma primero; el viejo llega tarde y se descarta
+        assert store.rebuild(new, catalog=new_cat, generation=new_gen) == 6
+        assert store.rebuild(old, catalog=old_cat, generation=old_gen) == 0
+        assert store.info() == dict(store.info(), model_version="v-new", n_zones=6)
+
+
+class TestSimulate:
+    """Test suite for PCARecommender.simulate"""
+
+    def test_simulate_matches_transform(self):
+        """Test that the affine shortcut matches re-running transform on edited data"""
+        np.random.seed(7)
+        df = pd.DataFrame({col: np.random.rand(30) for col in DEFAULT_BASE_COLS})
+        rec = PCARecommender().fit(df)
+        res = rec.simulate(df, ["BANQUETA_C", "ALUMPUB_C"], [-0.3, 0.5])
+        sims = res["simulations"]
+        assert len(sims) == 30 * 2 * 2
+
+        for feature in ["BANQUETA_C", "ALUMPUB_C"]:
+            for delta in [-0.3, 0.5]:
+                edited = df.copy()
+                edited[feature] += delta
+                expected = rec.transform(edited)["recommendations"]
+                got = sims[(sims["feature"] == feature) & (sims["delta"] == delta)].reset_index(drop=True)
+                assert (got["recommended_intervention"].values == expected["recommended_intervention"].values).all()
+                np.testing.assert_allclose(got["weak_score"].values, expected["weak_score"].values)
+
+    def test_simulate_unknown_feature_raises(self):
+        """Test that simulating a feature outside the model raises"""
+        np.random.seed(7)
+        df = pd.DataFrame({col: np.random.rand(10) for col in DEFAULT_BASE_COLS})
+        rec = PCARecommender().fit(df)
+        with pytest.raises(ValueError):
+            rec.simulate(df, ["NOPE"], [1.0])
+
+
+class TestPriorityRanker:
+    """Test suite for PriorityRanker"""
+
+    @pytest.fixture
+    def recs(self):
+        np.random.seed(11)
+        df = pd.DataFrame({col: np.random.rand(200) for col in DEFAULT_BASE_COLS})
+        out = PCARecommender().fit(df).transform(df)["recommendations"]
+        out["segment"] = np.where(np.arange(200) % 2, "norte", "sur")
+        out["lat"] = np.linspace(19.0, 20.0, 200)
+        out["lon"] = np.linspace(-100.0, -99.0, 200)
+        return out
+
+    def test_top_k_matches_sort(self, recs):
+        """Test that argpartition top-k equals a full sort"""
+        from src.models import PriorityRanker
+        ranker = PriorityRanker(recs)
+        intervention = recs["recommended_intervention"].mode()[0]
+        top = ranker.top_k(5, intervention=intervention)
+        expected = recs[recs["recommended_intervention"] == intervention].nsmallest(5, "worst_feature_z")
+        np.testing.assert_allclose(top["worst_feature_z"].values, expected["worst_feature_z"].values)
+        assert top["rank"].tolist() == [1, 2, 3, 4, 5]
+
+        per = ranker.top_k_per_intervention(3, segment="norte", bbox=(-99.8, 19.2, -99.2, 19.8))
+        assert set(per) == set(recs.loc[recs["worst_feature"].notna(), "recommended_intervention"])
+        for t in per.values():
+            assert (t["segment"] == "norte").all()
+            assert t["lat"].between(19.2, 19.8).all()
+
+    def test_allocate_respects_budget_and_caps(self, recs):
+        """Test greedy allocation under a budget, costs and per-intervention caps"""
+        from src.models import PriorityRanker
+        ranker = PriorityRanker(recs)
+        banquetas = DEFAULT_INTERV_MAP["BANQUETA_C"]
+        chosen, totals = ranker.allocate(20, costs={banquetas: 3.0}, max_per_intervention=4)
+        assert totals["spent"] <= 20
+        assert chosen["cost"].sum() == pytest.approx(totals["spent"])
+        assert chosen["recommended_intervention"].value_counts().max() <= 4
+        assert (chosen.loc[chosen["recommended_intervention"] == banquetas, "cost"] == 3.0).all()
+        assert (chosen["deficit_reduction"] > 0).all()
+
+        with pytest.raises(ValueError):
+            ranker.allocate(5, costs={banquetas: 0.0})
+
+    def test_caps_count_interventions_not_features(self):
+        """Test that features sharing an intervention (GRAPROES*) share its cap"""
+        from src.models import PriorityRanker
+        feats = ["GRAPROES", "GRAPROES_F", "GRAPROES_M", "BANQUETA_C"] * 6
+        recs = pd.DataFrame({
+            "worst_feature": feats,
+            "recommended_intervention": [DEFAULT_INTERV_MAP[f] for f in feats],
+            "worst_feature_z": -np.linspace(1.0, 3.0, len(feats)),
+            "weak_score": -np.linspace(1.0, 3.0, len(feats)),
+        })
+        ranker = PriorityRanker(recs)
+        assert set(ranker.top_k_per_intervention(2)) == {"Escuelas", DEFAULT_INTERV_MAP["BANQUETA_C"]}
+
+        chosen, totals = ranker.allocate(100, costs={"Escuelas": 2.0}, max_per_intervention=4)
+        assert chosen["recommended_intervention"].value_counts().to_dict() == {
+            "Escuelas": 4, DEFAULT_INTERV_MAP["BANQUETA_C"]: 4}
+        assert totals["spent"] == pytest.approx(4 * 2.0 + 4 * 1.0)
+
+
+class TestInputAdapters:
+    """Test suite for non-pandas inputs to fit/transform"""
+
+    @pytest.fixture
+    def sample_data(self):
+        np.random.seed(42)
+        data = {col: np.random.rand(25) for col in DEFAULT_BASE_COLS}
+        return pd.DataFrame(data)
+
+    def _assert_same(self, sample_data, other):
+        expected = PCARecommender().fit(sample_data).transform(sample_data)["recommendations"]
+        got = PCARecommender().fit(other).transform(other)["recommendations"]
+        pd.testing.assert_frame_equal(expected, got, check_dtype=False)
+
+    def test_numpy_2d(self, sample_data):
+        """Test positional 2-D arrays in DEFAULT_BASE_COLS order"""
+        self._assert_same(sample_data, sample_data.to_numpy())
+
+    def test_numpy_2d_wrong_width_raises(self, sample_data):
+        """Test that a 2-D array with the wrong number of columns is rejected"""
+        with pytest.raises(ValueError):
+            PCARecommender().fit(sample_data.to_numpy()[:, :3])
+
+    def test_numpy_structured(self, sample_data):
+        """Test structured arrays mapped by field name"""
+        self._assert_same(sample_data, sample_data.to_records(index=False))
+
+    def test_pyarrow_table(self, sample_data):
+        """Test pyarrow.Table input"""
+        pa = pytest.importorskip("pyarrow")
+        self._assert_same(sample_data, pa.Table.from_pandas(sample_data))
+
+    def test_polars_frame(self, sample_data):
+        """Test polars.DataFrame input"""
+        pl = pytest.importorskip("polars")
+        self._assert_same(sample_data, pl.from_pandas(sample_data))
+
+    def test_missing_and_non_numeric_columns(self, sample_data):
+        """Test that missing columns become NaN and non-numeric values are coerced"""
+        rec = PCARecommender().fit(sample_data)
+        partial = sample_data.drop(columns=["BANQUETA_C"]).astype({"ALUMPUB_C": object})
+        partial.loc[0, "ALUMPUB_C"] = "n/d"
+        results = rec.transform(partial)
+        assert len(results["recommendations"]) == len(sample_data)
+
+
+class TestDriftMonitor:
+    """Test suite for DriftMonitor"""
+
+    @pytest.fixture
+    def fitted(self):
+        np.random.seed(21)
+        df = pd.DataFrame({col: np.random.normal(size=2000) for col in DEFAULT_BASE_COLS})
+        return PCARecommender().fit(df), df
+
+    def test_batched_moments_match_numpy(self, fitted):
+        """Test that merged batch updates equal one-shot moments and NaN rates"""
+        from src.models import DriftMonitor
+        rec, df = fitted
+        live = df.sample(frac=1.0, random_state=0).reset_index(drop=True)
+        live.loc[:99, "ALUMPUB_C"] = np.nan
+        monitor = DriftMonitor().reset(rec, reference=df)
+        for chunk in np.array_split(np.arange(len(live)), 7):
+            monitor.update(live.iloc[chunk])
+
+        rep = {f["feature"]: f for f in monitor.report()["features"]}
+        assert rep["GRAPROES"]["mean"] == pytest.approx(live["GRAPROES"].mean())
+        assert rep["GRAPROES"]["std"] == pytest.approx(live["GRAPROES"].std(ddof=0))
+        assert rep["ALUMPUB_C"]["nan_rate"] == pytest.approx(100 / len(live))
+        assert rep["GRAPROES"]["psi"] < 0.01
+
+    def test_detects_shift_without_reference(self, fitted):
+        """Test PSI and mean shift using only the fitted scaler as reference"""
+        from src.models import DriftMonitor
+        rec, df = fitted
+        monitor = DriftMonitor(sample_rate=0.5, seed=0).reset(rec)
+        live = df.copy()
+        live["BANQUETA_C"] += 1.0
+        sampled = monitor.update(live)
+
+        rep = monitor.report()
+        assert 0 < sampled < len(live)
+        assert rep["drifted_features"] == ["BANQUETA_C"]
+        shift = next(f for f in rep["features"] if f["feature"] == "BANQUETA_C")["mean_shift_z"]
+        assert shift == pytest.approx(1.0, abs=0.15)
+
+    def test_concurrent_reset_never_breaks_update(self, fitted):
+        """Test that batches racing a reset to different bins are dropped, not merged"""
+        import threading
+        from src.models import DriftMonitor
+        rec, df = fitted
+        # datos enteros con empates -> menos bins que la referencia continua
+        tied = df.round().clip(-1, 1)
+        rec_tied = PCARecommender().fit(tied)
+        monitor = DriftMonitor().reset(rec, reference=df)
+        errors, stop = [], threading.Event()
+
+        def serve():
+            while not stop.is_set():
+                try:
+                    monitor.update(df.iloc[:200])
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=serve) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for i in range(60):
+            monitor.reset(*((rec_tied, tied) if i % 2 else (rec, df)))
+        stop.set()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        rep = monitor.report()
+        assert all(len(h) == len(e) + 1 for h, e in zip(monitor.hist_, monitor.edges_))
+        assert rep["rows_sampled"] % 200 == 0
+
+
+class TestZoneLocator:
+    """Test suite for ZoneLocator"""
+
+    def test_nearest_matches_brute_force(self):
+        """Test ball tree results against brute-force haversine distances"""
+        from src.models import ZoneLocator
+        from src.models.geo import EARTH_RADIUS_M
+
+        rng = np.random.default_rng(0)
+        lat, lon = rng.uniform(19.2, 19.6, 500), rng.uniform(-99.3, -98.9, 500)
+        locator = ZoneLocator([f"z{i}" for i in range(500)], lat, lon)
+        qlat, qlon = rng.uniform(19.2, 19.6, 20), rng.uniform(-99.3, -98.9, 20)
+        ids, dist = locator.nearest(qlat, qlon, k=3)
+        assert ids.shape == (20, 3)
+
+        p1, p2 = np.radians(qlat)[:, None], np.radians(lat)[None, :]
+        dl = np.radians(lon)[None, :] - np.radians(qlon)[:, None]
+        h = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+        brute = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(h))
+        np.testing.assert_allclose(dist, np.sort(brute, axis=1)[:, :3], rtol=1e-6)
+        assert ids[0, 0] == f"z{np.argmin(brute[0])}"
+
+        within_ids, within_d = locator.within(qlat, qlon, radius_m=2000)
+        for i in range(20):
+            assert len(within_ids[i]) == int((brute[i] <= 2000).sum())
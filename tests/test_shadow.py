@@ -0,0 +1,79 @@
+"""Tests for shadow scoring of candidate models"""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the project root to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import pandas as pd
+import numpy as np
+from src.models import PCARecommender, DEFAULT_BASE_COLS
+from src.api.shadow import ShadowScorer
+
+
+class TestShadowScorer:
+    """Test suite for ShadowScorer"""
+
+    @pytest.fixture
+    def data(self):
+        np.random.seed(9)
+        return pd.DataFrame({col: np.random.rand(60) for col in DEFAULT_BASE_COLS})
+
+    def test_identical_candidate_never_disagrees(self, data):
+        """Test that a candidate equal to the serving model has zero disagreement"""
+        serving = PCARecommender().fit(data)
+        scorer = ShadowScorer(sample_rate=1.0, max_pending=100)
+        scorer.set_candidate(PCARecommender(model_version="v2").fit(data))
+
+        served = serving.transform(data)["recommendations"]
+        assert scorer.submit(data, served)
+        scorer.flush(timeout=10)
+
+        rep = scorer.report("v1.0")
+        assert rep["rows_compared"] == len(data)
+        assert rep["intervention_disagreement"] == 0
+        assert sum(t["rows"] for t in rep["by_weak_component"].values()) == len(data)
+
+        # el candidato se puntúa en otro proceso, que termina al cerrar
+        sidecar = scorer._sidecar.proc
+        assert sidecar.pid != os.getpid()
+        # el hijo solo carga src.models: nada de la app (store, monitores, FastAPI)
+        info = scorer._sidecar.info()
+        assert info["pid"] == sidecar.pid
+        assert "src.models.shadow_worker" in info["modules"]
+        assert not any(m.startswith("src.api") for m in info["modules"])
+        scorer.close()
+        assert not sidecar.is_alive()
+
+    def test_disagreement_is_counted_per_key(self, data):
+        """Test per-intervention disagreement against a candidate fit on other data"""
+        serving = PCARecommender().fit(data)
+        other = data.sample(frac=1.0, random_state=1).reset_index(drop=True) ** 3
+        candidate = PCARecommender(model_version="v2").fit(other)
+        scorer = ShadowScorer(sample_rate=1.0, max_pending=100)
+        scorer.set_candidate(candidate)
+
+        served = serving.transform(data)["recommendations"]
+        scorer.submit(data, served)
+        scorer.flush(timeout=10)
+
+        expected = (served["recommended_intervention"].values
+                    != candidate.transform(data)["recommendations"]["recommended_intervention"].values)
+        rep = scorer.report()
+        assert rep["intervention_disagreement"] == pytest.approx(expected.mean())
+
+    def test_sampling_and_backpressure(self, data):
+        """Test that nothing is scored without a candidate and excess samples are dropped"""
+        serving = PCARecommender().fit(data)
+        served = serving.transform(data)["recommendations"]
+        scorer = ShadowScorer(sample_rate=1.0, max_pending=0)
+        assert not scorer.submit(data, served)  # sin candidato
+        scorer.set_candidate(serving)
+        assert not scorer.submit(data, served)
+        assert scorer.report()["requests_dropped"] == 1
+        assert scorer.clear() is serving
+        assert scorer.report() == {"active": False}